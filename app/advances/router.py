@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 from app.advances.schemas import AdvanceRequest
 from app.advances.service import advances_service
-from app.auth.schemas import SuccessResponse
+from app.auth.schemas import SuccessResponse, ok
 
 router = APIRouter(tags=["advances"])
 
@@ -40,8 +40,8 @@ async def take_advance(req: AdvanceRequest):
     - Deducts from issuer pool
     - Creates advance record
     """
-    result = advances_service.take_advance(req)
-    return SuccessResponse(**result)
+    result = await advances_service.take_advance(req)
+    return ok(result)
 
 
 # -----------------------------------------------------------
@@ -57,8 +57,8 @@ async def auto_repay():
     - Returns funds to issuer pool
     - Marks advance fully repaid when balance reaches 0
     """
-    result = advances_service.auto_repay()
-    return SuccessResponse(**result)
+    result = await advances_service.auto_repay()
+    return ok(result)
 
 # -----------------------------------------------------------
 # GET USER ADVANCE SUMMARY (for wallet screen)
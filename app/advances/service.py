@@ -2,6 +2,7 @@ from decimal import Decimal
 from app.shared.database import database_service
 from app.wallet.service import wallet_service
 from app.transactions.service import transactions_service
+from app.transactions.schemas import CreditRequest, PaymentRequest
 from app.subscriptions.service import subscription_service
 from app.advances.utils import now_iso
 
@@ -48,6 +49,11 @@ class AdvancesService:
                 "pool_limit": 0
             }
 
+        availability, _ = self._compute_availability(user_id, limits)
+        return availability
+
+    def _compute_availability(self, user_id, limits):
+        """Availability for already-resolved limits, plus the pool row it used (or None)"""
         weekly_limit = limits["weekly_limit"]
         outstanding = self.get_outstanding(user_id)
         total_outstanding = sum(float(x["outstanding_amount"]) for x in outstanding)
@@ -59,7 +65,7 @@ class AdvancesService:
                 "outstanding": total_outstanding,
                 "available": 0,
                 "pool_limit": 0
-            }
+            }, None
 
         # RULE 2 — If no outstanding debt, full weekly limit is unlocked.
         pool = self.get_issuer_pool()
@@ -72,7 +78,7 @@ class AdvancesService:
             "outstanding": 0,
             "available": available,
             "pool_limit": pool_balance
-        }
+        }, pool
 
     # ------------------------------------------------------
     # Fetch issuer pool (single pool model)
@@ -88,13 +94,14 @@ class AdvancesService:
     # ------------------------------------------------------
     # Fully automatic advance issuing
     # ------------------------------------------------------
-    def take_advance(self, req):
+    async def take_advance(self, req):
 
         limits, error = self.get_user_limits(req.user_id)
         if error:
             return error
 
-        availability = self.get_available_advance(req.user_id)
+        # Limits and the pool row are resolved once and reused for the whole request
+        availability, pool = self._compute_availability(req.user_id, limits)
         max_available = float(availability["available"])
 
         # If outstanding advance exists, deny borrowing
@@ -112,7 +119,6 @@ class AdvancesService:
             }
 
         # Check pool liquidity
-        pool = self.get_issuer_pool()
         pool_balance = float(pool["current_balance"])
 
         if pool_balance < float(req.amount):
@@ -123,27 +129,26 @@ class AdvancesService:
         # ------------------------------------------------------
 
         # 1. CREDIT WALLET (Advance is a deposit)
-        credit = transactions_service.process_credit(type(
-            "obj", (object,), {
-                "user_id": req.user_id,
-                "amount": req.amount,
-                "credit_type": "advance_credit",
-                "description": "Advance credited to wallet",
-                "metadata": {"issuer_pool_id": pool["id"]}
-            }
+        credit = await transactions_service.process_credit(CreditRequest.model_construct(
+            user_id=req.user_id,
+            amount=req.amount,
+            credit_type="advance_credit",
+            description="Advance credited to wallet",
+            metadata={"issuer_pool_id": pool["id"]},
         ))
 
         if not credit["success"]:
             return credit
 
         # 2. Deduct from pool (money lent out)
+        now = now_iso()
         database_service.supabase.make_request(
             "PATCH",
             f"/rest/v1/advance_issuer_pool?id=eq.{pool['id']}",
             {
                 "current_balance": pool_balance - float(req.amount),
                 "total_lent": float(pool["total_lent"]) + float(req.amount),
-                "updated_at": now_iso()
+                "updated_at": now
             },
             database_service.supabase.service_headers
         )
@@ -155,7 +160,7 @@ class AdvancesService:
             "total_amount": float(req.amount),
             "outstanding_amount": float(req.amount),
             "status": "active",
-            "created_at": now_iso()
+            "created_at": now
         }
 
         created = database_service.supabase.make_request(
@@ -252,7 +257,7 @@ class AdvancesService:
     # ------------------------------------------------------
     # Weekly Automatic Repayment (FRIDAY CRON)
     # ------------------------------------------------------
-    def auto_repay(self):
+    async def auto_repay(self):
 
         advances = database_service.supabase.make_request(
             "GET",
@@ -285,7 +290,7 @@ class AdvancesService:
             weekly_repay = total_amount * (repay_rate / 100)
             repay_amount = min(weekly_repay, outstanding)
 
-            wallet = wallet_service.get_wallet_by_user_id(user_id)
+            wallet = await wallet_service.get_wallet_by_user_id(user_id)
             if not wallet:
                 continue
 
@@ -298,14 +303,12 @@ class AdvancesService:
             # ------------------------------------------------------
             # Deduct repayment from wallet
             # ------------------------------------------------------
-            debit = transactions_service.process_payment(type(
-                "obj", (object,), {
-                    "user_id": user_id,
-                    "amount": Decimal(repay_amount),
-                    "payment_type": "advance_repayment",
-                    "description": "Weekly automatic advance repayment",
-                    "metadata": {"advance_id": adv["id"]}
-                }
+            debit = await transactions_service.process_payment(PaymentRequest.model_construct(
+                user_id=user_id,
+                amount=Decimal(repay_amount),
+                payment_type="advance_repayment",
+                description="Weekly automatic advance repayment",
+                metadata={"advance_id": adv["id"]},
             ))
 
             if not debit["success"]:
@@ -314,6 +317,7 @@ class AdvancesService:
             # UPDATE outstanding
             remaining = outstanding - repay_amount
             new_status = "repaid" if remaining <= 0 else "active"
+            now = now_iso()
 
             database_service.supabase.make_request(
                 "PATCH",
@@ -321,8 +325,8 @@ class AdvancesService:
                 {
                     "outstanding_amount": remaining,
                     "status": new_status,
-                    "updated_at": now_iso(),
-                    "repaid_at": now_iso() if new_status == "repaid" else None
+                    "updated_at": now,
+                    "repaid_at": now if new_status == "repaid" else None
                 },
                 database_service.supabase.service_headers
             )
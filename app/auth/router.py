@@ -32,8 +32,8 @@ router = APIRouter(tags=["authentication"])
 @router.post("/signup", response_model=SuccessResponse, status_code=status.HTTP_201_CREATED)
 async def signup(user_data: UserCreateRequest, background_tasks: BackgroundTasks):
     try:
-        print("🔥 SIGNUP PAYLOAD RECEIVED:", user_data.dict())
-        result = auth_service.register_user(user_data.dict())
+        print("🔥 SIGNUP PAYLOAD RECEIVED:", user_data.model_dump())
+        result = auth_service.register_user(user_data.model_dump())
         if not result["success"]:
             return SuccessResponse(success=False, message=result["message"])
 
@@ -41,9 +41,15 @@ async def signup(user_data: UserCreateRequest, background_tasks: BackgroundTasks
         verification_token = shared_auth_service.create_verification_token(user["id"], user["email"])
         expires_at = datetime.now(timezone.utc) + timedelta(hours=settings.verification_token_expire_hours)
 
-        database_service.set_verification_token(user["id"], verification_token, expires_at)
         verification_url = f"{settings.api_base_url}/verify-email?token={verification_token}"
 
+        # Background tasks run in order: persist the token before the email goes out
+        background_tasks.add_task(
+            database_service.set_verification_token,
+            user["id"],
+            verification_token,
+            expires_at
+        )
         background_tasks.add_task(
             email_service.send_verification_email,
             user["email"],
@@ -96,10 +102,9 @@ async def resend_verification(request: ResendVerificationRequest, background_tas
 
         token = shared_auth_service.create_verification_token(user["id"], user["email"])
         expires_at = datetime.now(timezone.utc) + timedelta(hours=settings.verification_token_expire_hours)
-        database_service.set_verification_token(user["id"], token, expires_at)
-
         verification_url = f"{settings.api_base_url}/verify-email?token={token}"
 
+        background_tasks.add_task(database_service.set_verification_token, user["id"], token, expires_at)
         background_tasks.add_task(
             email_service.send_verification_email,
             user["email"],
@@ -432,7 +437,7 @@ async def resend_phone_otp(request: ResendOTPRequest, background_tasks: Backgrou
 @router.get("/test-sms-connection", response_model=SuccessResponse)
 async def test_sms_connection():
     try:
-        result = sms_service.test_connection()
+        result = await sms_service.test_connection()
 
         if result.get("success"):
             return SuccessResponse(
@@ -2,13 +2,22 @@
 Authentication Schemas
 """
 
-from pydantic import BaseModel, validator, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, field_serializer, field_validator
+from typing import Annotated, Optional
 from datetime import datetime
+from decimal import Decimal
 import re
 
 EMAIL_REGEX = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
 
+# At least 10 digits, allowing spaces, dashes and a leading "+"
+PHONE_PATTERN = r"^\D*(?:\d\D*){10,}$"
+PHONE_REGEX = re.compile(PHONE_PATTERN)
+
+# Validated by pydantic-core in a single pass
+PhoneNumber = Annotated[str, StringConstraints(strip_whitespace=True, min_length=10, pattern=PHONE_PATTERN)]
+OTPCode = Annotated[str, StringConstraints(strip_whitespace=True, pattern=r"^\d{6}$")]
+
 
 # ---------------------------------------------------------
 # User Registration & Login
@@ -20,13 +29,15 @@ class UserCreateRequest(BaseModel):
     terms_agreed: bool
     phone_number: Optional[str] = Field(None, min_length=10, max_length=20)
 
-    @validator("email")
+    @field_validator("email")
+    @classmethod
     def validate_email(cls, v):
         if not EMAIL_REGEX.match(v):
             raise ValueError("Invalid email format")
         return v.lower()
 
-    @validator("password")
+    @field_validator("password")
+    @classmethod
     def validate_password(cls, v):
         if len(v) < 6:
             raise ValueError("Password must be at least 6 characters")
@@ -34,12 +45,11 @@ class UserCreateRequest(BaseModel):
             raise ValueError("Password cannot exceed 72 characters")
         return v
 
-    @validator("phone_number")
+    @field_validator("phone_number")
+    @classmethod
     def validate_phone(cls, v):
-        if v:
-            digits = "".join(filter(str.isdigit, v))
-            if len(digits) < 10:
-                raise ValueError("Invalid phone number format")
+        if v and not PHONE_REGEX.match(v):
+            raise ValueError("Invalid phone number format")
         return v
 
 
@@ -47,13 +57,15 @@ class UserLoginRequest(BaseModel):
     email: str
     password: str = Field(..., min_length=6, max_length=72)
 
-    @validator("email")
+    @field_validator("email")
+    @classmethod
     def validate_email(cls, v):
         if not EMAIL_REGEX.match(v):
             raise ValueError("Invalid email format")
         return v.lower()
 
-    @validator("password")
+    @field_validator("password")
+    @classmethod
     def validate_password(cls, v):
         if len(v) > 72:
             v = v[:72]
@@ -70,7 +82,8 @@ class VerifyEmailRequest(BaseModel):
 class ResendVerificationRequest(BaseModel):
     email: str
 
-    @validator("email")
+    @field_validator("email")
+    @classmethod
     def validate_email(cls, v):
         if not EMAIL_REGEX.match(v):
             raise ValueError("Invalid email format")
@@ -82,25 +95,12 @@ class ResendVerificationRequest(BaseModel):
 # ---------------------------------------------------------
 class SendOTPRequest(BaseModel):
     user_id: str = Field(..., min_length=1)
-    phone_number: str = Field(..., min_length=10)
-
-    @validator("phone_number")
-    def validate_phone(cls, v):
-        digits = "".join(filter(str.isdigit, v))
-        if len(digits) < 10:
-            raise ValueError("Invalid phone number format")
-        return v
+    phone_number: PhoneNumber
 
 
 class VerifyOTPRequest(BaseModel):
     user_id: str = Field(..., min_length=1)
-    otp_code: str = Field(..., min_length=6, max_length=6)
-
-    @validator("otp_code")
-    def validate_otp(cls, v):
-        if not v.isdigit():
-            raise ValueError("OTP must contain only digits")
-        return v
+    otp_code: OTPCode
 
 
 class ResendOTPRequest(BaseModel):
@@ -111,12 +111,36 @@ class ResendOTPRequest(BaseModel):
 # Response Models
 # ---------------------------------------------------------
 class SuccessResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     success: bool
     message: str
     data: Optional[dict] = None
 
+    @field_serializer("data", when_used="json")
+    def _amounts_as_numbers(self, data: Optional[dict]):
+        # Services keep money as Decimal; clients have always received JSON numbers
+        return _decimals_to_float(data)
+
+
+def _decimals_to_float(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, dict):
+        return {k: _decimals_to_float(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decimals_to_float(v) for v in value]
+    return value
+
+
+def ok(result: dict) -> SuccessResponse:
+    """Wrap a service result dict without re-running field validation"""
+    return SuccessResponse.model_construct(**result)
+
 
 class ErrorResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     success: bool = False
     error: str
     details: Optional[str] = None
@@ -154,12 +178,11 @@ class UserInDB(BaseModel):
 
 
 class UserResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
     id: str
     full_name: str
     email: str
     email_verified: bool
     phone_number: Optional[str] = None
     created_at: datetime
-
-    class Config:
-        from_attributes = True
@@ -65,7 +65,8 @@ class AuthService:
             return {"success": False, "message": "Invalid token"}
 
         user_id = payload.get("sub")
-        user = self.db.get_user_by_id(user_id)
+        # Uncached: the stored token may have been reissued by another worker
+        user = self.db.get_user_by_id(user_id, use_cache=False)
 
         if not user:
             return {"success": False, "message": "User not found"}
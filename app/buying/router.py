@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 from app.buying.schemas import AirtimePurchaseRequest, BundlePurchaseRequest
 from app.buying.service import buying_service
-from app.auth.schemas import SuccessResponse
+from app.auth.schemas import SuccessResponse, ok
 
 router = APIRouter(tags=["buying"])
 
@@ -10,13 +10,13 @@ router = APIRouter(tags=["buying"])
 # -------------------------
 @router.post("/airtime", response_model=SuccessResponse)
 async def buy_airtime(req: AirtimePurchaseRequest):
-    result = buying_service.buy_airtime(req)
-    return SuccessResponse(**result)
+    result = await buying_service.buy_airtime(req)
+    return ok(result)
 
 # -------------------------
 # BUY DATA or VOICE BUNDLE
 # -------------------------
 @router.post("/bundle", response_model=SuccessResponse)
 async def buy_bundle(req: BundlePurchaseRequest):
-    result = buying_service.buy_bundle(req)
-    return SuccessResponse(**result)
+    result = await buying_service.buy_bundle(req)
+    return ok(result)
@@ -1,6 +1,7 @@
 from decimal import Decimal
 from app.shared.database import database_service
 from app.transactions.service import transactions_service
+from app.transactions.schemas import PaymentRequest
 from app.buying.utils import now_iso
 
 
@@ -45,7 +46,7 @@ class BuyingService:
     # ------------------------------------------------
     # PURCHASE AIRTIME
     # ------------------------------------------------
-    def buy_airtime(self, req):
+    async def buy_airtime(self, req):
 
         # Log pending
         self.log_purchase(
@@ -59,14 +60,12 @@ class BuyingService:
         )
 
         # Deduct from wallet using the Transactions Microservice
-        result = transactions_service.process_payment(type(
-            "obj", (object,), {
-                "user_id": req.user_id,
-                "amount": req.amount,
-                "payment_type": "airtime",
-                "description": f"Airtime purchase for {req.beneficiary_number}",
-                "metadata": {"network": req.network}
-            }
+        result = await transactions_service.process_payment(PaymentRequest.model_construct(
+            user_id=req.user_id,
+            amount=req.amount,
+            payment_type="airtime",
+            description=f"Airtime purchase for {req.beneficiary_number}",
+            metadata={"network": req.network},
         ))
 
         if not result["success"]:
@@ -103,7 +102,7 @@ class BuyingService:
     # ------------------------------------------------
     # PURCHASE BUNDLE (DATA / VOICE)
     # ------------------------------------------------
-    def buy_bundle(self, req):
+    async def buy_bundle(self, req):
 
         bundle = self.get_bundle(req.bundle_id)
         if not bundle:
@@ -122,14 +121,12 @@ class BuyingService:
         )
 
         # Deduct from Wallet
-        result = transactions_service.process_payment(type(
-            "obj", (object,), {
-                "user_id": req.user_id,
-                "amount": Decimal(bundle["price"]),
-                "payment_type": "bundle_purchase",
-                "description": f"{bundle['name']} for {req.beneficiary_number}",
-                "metadata": {"bundle_id": bundle["id"]}
-            }
+        result = await transactions_service.process_payment(PaymentRequest.model_construct(
+            user_id=req.user_id,
+            amount=Decimal(bundle["price"]),
+            payment_type="bundle_purchase",
+            description=f"{bundle['name']} for {req.beneficiary_number}",
+            metadata={"bundle_id": bundle["id"]},
         ))
 
         if not result["success"]:
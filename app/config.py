@@ -19,11 +19,14 @@ class Settings(BaseSettings):
     supabase_url: str
     supabase_anon_key: str
     supabase_service_role: str
+    supabase_pool_size: int = 15  # per-worker async connection cap (session pooler ceiling)
+    supabase_pool_keepalive: int = 10
     
     # Authentication
     jwt_secret_key: str
     jwt_algorithm: str = "HS256"
     verification_token_expire_hours: int = 24
+    bcrypt_rounds: int = 12
     
     # Email / AWS SES
     ses_sender_email: str
@@ -38,6 +41,10 @@ class Settings(BaseSettings):
     otp_expiry_minutes: int = 10
     otp_max_attempts: int = 3
     otp_resend_delay_seconds: int = 60
+    sms_pool_mode: str = "realtime"  # "realtime" or "batch"
+    sms_pool_size: Optional[int] = None
+    sms_pool_keepalive: Optional[int] = None
+    sms_batch_size: int = 100
     
     # Development
     use_supabase_auth: bool = False
@@ -5,12 +5,16 @@ import boto3
 from botocore.exceptions import ClientError
 import logging
 from datetime import datetime, timezone
-import json
 import re
 from app.config import settings
+from app.shared.audit_log import AuditLog
 
 logger = logging.getLogger(__name__)
 
+_EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+_email_debug_log = AuditLog('logs/email_debug.log')
+
 class EmailService:
     def __init__(self):
         self.sender_email = settings.ses_sender_email
@@ -110,8 +114,7 @@ class EmailService:
     
     def _validate_email(self, email: str) -> bool:
         """Validate email address format"""
-        email_pattern = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
-        return bool(email_pattern.match(email))
+        return bool(_EMAIL_PATTERN.match(email))
     
     def _send_email_internal(self, email: str, subject: str, html_body: str, text_body: str) -> bool:
         """Internal method to send email with fallback"""
@@ -161,12 +164,7 @@ class EmailService:
         print(f"Subject: {subject}")
         print(f"{'='*60}\n")
         
-        try:
-            with open('logs/email_debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(debug_info, indent=2))
-                f.write('\n' + '-'*50 + '\n')
-        except Exception as e:
-            logger.error(f"Failed to write debug log: {e}")
+        _email_debug_log.write(debug_info)
         
         return True
     
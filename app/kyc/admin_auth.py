@@ -2,7 +2,9 @@
 Admin Authentication Middleware
 """
 
+import hashlib
 import logging
+import time
 from fastapi import HTTPException, Header
 from typing import Optional
 
@@ -11,12 +13,29 @@ from app.shared.database import database_service
 
 logger = logging.getLogger(__name__)
 
+# Verified admin tokens skip the JWT decode and admins lookup for this long
+# (never past the token's own expiry); deactivations apply within the TTL
+_ADMIN_TTL_SECONDS = 60
+_ADMIN_CACHE_SIZE = 1_000
+
+# sha256(token) -> (valid_until, admin_id), valid_until on the monotonic clock;
+# hashed so bearer tokens are never held in memory
+_verified_tokens = {}
+
 
 def verify_admin_token(admin_token: Optional[str] = Header(None, alias="admin-token")):
     """Validate admin JWT and ensure admin exists"""
     if not admin_token:
         raise HTTPException(status_code=401, detail="Missing admin token")
 
+    now = time.monotonic()
+    token_key = hashlib.sha256(admin_token.encode()).digest()
+    cached = _verified_tokens.get(token_key)
+    if cached:
+        if now < cached[0]:
+            return cached[1]
+        _verified_tokens.pop(token_key, None)
+
     payload = auth_service.decode_token(admin_token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
@@ -37,8 +56,19 @@ def verify_admin_token(admin_token: Optional[str] = Header(None, alias="admin-to
         if not admin.get("is_active", True):
             raise HTTPException(status_code=403, detail="Admin account inactive")
 
-        return admin_id
-
     except Exception as e:
         logger.error(f"Admin verification failed ({admin_id}): {e}")
         raise HTTPException(status_code=403, detail="Admin verification failed")
+
+    ttl = min(_ADMIN_TTL_SECONDS, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        if len(_verified_tokens) >= _ADMIN_CACHE_SIZE:
+            # Clear expired entries first; fall back to dropping the oldest
+            for key, (valid_until, _) in list(_verified_tokens.items()):
+                if valid_until <= now:
+                    _verified_tokens.pop(key, None)
+            if len(_verified_tokens) >= _ADMIN_CACHE_SIZE:
+                _verified_tokens.pop(next(iter(_verified_tokens)), None)
+        _verified_tokens[token_key] = (now + ttl, admin_id)
+
+    return admin_id
@@ -22,11 +22,14 @@ from app.kyc.admin_auth import verify_admin_token
 from app.shared.database import database_service
 from app.wallet.service import wallet_service
 from app.email.service import email_service
+from app.shared.audit_log import AuditLog
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["kyc"])
 
+_kyc_audit_log = AuditLog("logs/kyc_audit.log")
+
 
 # ---------------------------------------------------------
 # USER KYC SUBMISSION
@@ -128,11 +131,12 @@ async def verify_kyc(
         user_id = kyc_record["user_id"]
 
         # Prepare updates
+        now = datetime.utcnow().isoformat()
         updates = {
             "kyc_status": request.kyc_status.value,
             "bav_status": request.bav_status.value,
             "admin_notes": request.admin_notes,
-            "updated_at": datetime.utcnow().isoformat(),
+            "updated_at": now,
         }
 
         # Apply updates
@@ -146,12 +150,13 @@ async def verify_kyc(
             database_service.supabase.make_request(
                 "PATCH",
                 f"/rest/v1/users?id=eq.{user_id}",
-                {"is_kyc_verified": True, "updated_at": datetime.utcnow().isoformat()},
+                {"is_kyc_verified": True, "updated_at": now},
                 headers=database_service.supabase.service_headers,
             )
+            database_service.supabase.invalidate_user(user_id)
 
             # Create wallet
-            wallet_result = wallet_service.create_wallet(user_id)
+            wallet_result = await wallet_service.create_wallet(user_id)
 
             # Send welcome email
             if wallet_result.get("success"):
@@ -175,6 +180,7 @@ async def verify_kyc(
                 {"is_kyc_verified": False},
                 headers=database_service.supabase.service_headers,
             )
+            database_service.supabase.invalidate_user(user_id)
 
             _log_kyc(admin_id, user_id, "rejected")
 
@@ -249,11 +255,12 @@ async def auto_verify_pending(background_tasks: BackgroundTasks):
                 {"is_kyc_verified": True},
                 headers=database_service.supabase.service_headers,
             )
+            database_service.supabase.invalidate_user(user_id)
 
             # 3️⃣ Create wallet (safe mode — handles duplicates)
             wallet = database_service.get_wallet_by_user_id(user_id)
             if not wallet:
-                wallet_result = wallet_service.create_wallet(user_id)
+                wallet_result = await wallet_service.create_wallet(user_id)
                 if wallet_result.get("success"):
                     user = database_service.get_user_by_id(user_id)
                     wallet_number = wallet_result["wallet"]["wallet_number"]
@@ -364,6 +371,7 @@ async def revoke_kyc(
         },
         headers=database_service.supabase.service_headers,
     )
+    database_service.supabase.invalidate_user(user_id)
 
     # 4️⃣ Suspend wallet
     wallet_data = database_service.supabase.make_request(
@@ -381,6 +389,7 @@ async def revoke_kyc(
             {"status": "suspended"},
             headers=database_service.supabase.service_headers,
         )
+        wallet_service.invalidate_wallet(wallet_id)
 
     # 5️⃣ Send revocation email
     user = database_service.get_user_by_id(user_id)
@@ -408,15 +417,9 @@ async def revoke_kyc(
 # ---------------------------------------------------------
 def _log_kyc(admin_id: Optional[str], user_id: str, status: str):
     entry = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": datetime.utcnow(),
         "admin_id": admin_id,
         "user_id": user_id,
         "action": f"KYC {status}",
     }
-    try:
-        with open("logs/kyc_audit.log", "a") as f:
-            import json
-
-            f.write(json.dumps(entry) + "\n")
-    except Exception as e:
-        logger.error(f"Failed to write KYC audit log: {e}")
\ No newline at end of file
+    _kyc_audit_log.write(entry)
\ No newline at end of file
@@ -8,6 +8,7 @@ from datetime import datetime
 
 from app.shared.database import database_service
 from app.kyc.schemas import KYCStatus, BAVStatus
+from app.wallet.service import wallet_service
 
 logger = logging.getLogger(__name__)
 
@@ -21,13 +22,14 @@ class KYCService:
     # ---------------------------------------------------------
     def submit_kyc(self, user_id: str, kyc_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
+            now = datetime.utcnow().isoformat()
             record = {
                 "user_id": user_id,
                 **kyc_data,
                 "kyc_status": KYCStatus.PENDING.value,
                 "bav_status": BAVStatus.PENDING.value,
-                "created_at": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat(),
+                "created_at": now,
+                "updated_at": now,
             }
 
             response = self.supabase.make_request(
@@ -150,6 +152,7 @@ class KYCService:
                 {"is_kyc_verified": False},
                 headers=self.supabase.service_headers,
             )
+            self.supabase.invalidate_user(user_id)
 
             # 4️⃣ Suspend wallet (if exists)
             wallet_data = self.supabase.make_request(
@@ -167,6 +170,7 @@ class KYCService:
                     {"status": "suspended"},
                     headers=self.supabase.service_headers,
                 )
+                wallet_service.invalidate_wallet(wallet_id)
 
             return {
                 "success": True,
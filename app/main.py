@@ -2,15 +2,21 @@
 Main FastAPI Application
 """
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 import logging
 from datetime import datetime
 from typing import Optional
 import httpx
 
 from app.config import settings
+from app.sms.service import sms_service
+from app.shared.database import supabase_client
+from app.shared.audit_log import start_audit_logs, close_audit_logs
+from app.kyc.admin_auth import verify_admin_token
 
 # Routers
 from app.auth.router import router as auth_router
@@ -31,6 +37,24 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 
+# httpx logs full request URLs at INFO; WinSMS credentials travel in the query string
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+# ---------------------------------------------------------
+# Application Lifespan
+# ---------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sms_service.start()
+    supabase_client.start()
+    start_audit_logs()
+    yield
+    await close_audit_logs()
+    await sms_service.aclose()
+    await supabase_client.aclose()
+    supabase_client.close()
+
 
 # ---------------------------------------------------------
 # FastAPI App Initialization
@@ -41,6 +65,9 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs" if settings.enable_docs else None,
     redoc_url="/redoc" if settings.enable_docs else None,
+    # Serialise every JSON response (notably the wallet admin listings) with orjson
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 
@@ -99,6 +126,15 @@ async def health_check():
     }
 
 
+@app.get("/health/database")
+async def database_health(admin_id: str = Depends(verify_admin_token)):
+    return {
+        "status": "healthy",
+        "pools": supabase_client.get_stats(),
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
 # ---------------------------------------------------------
 # Email Verification Landing Page
 # ---------------------------------------------------------
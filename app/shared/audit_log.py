@@ -0,0 +1,167 @@
+"""
+Queued JSON-lines audit logs
+
+Request handlers (and sync code in the threadpool) enqueue entries; one
+background task per log batches them and writes each batch off the event loop.
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, BinaryIO
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Flush whatever has queued up after this long, or once this many entries wait
+_FLUSH_INTERVAL = 0.1
+_FLUSH_BATCH = 100
+# Past this many unwritten entries, new entries are dropped and counted
+_MAX_QUEUED = 10_000
+
+# Every AuditLog created; started and drained by the application lifespan
+_registry: List["AuditLog"] = []
+
+
+class AuditLog:
+    def __init__(self, path: str, max_bytes: Optional[int] = None):
+        self.path = path
+        # When set, the file is rolled over to <path>.1 once it reaches this size
+        self.max_bytes = max_bytes
+        self._queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=_MAX_QUEUED)
+        self._writer: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._fh: Optional[BinaryIO] = None
+        # Guards the file handle: batches are written from worker threads
+        self._fh_lock = threading.Lock()
+        self.dropped = 0
+        _registry.append(self)
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        """Queue one entry; written synchronously if the writer is not running"""
+        record = orjson.dumps(entry, default=str) + b"\n"
+        # Read once: aclose() may clear it from the loop thread meanwhile
+        loop = self._loop
+        if loop is None:
+            self._write_records([record])
+            return
+
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+
+        # asyncio.Queue is not thread-safe; worker threads hand off to the loop
+        if on_loop:
+            self._enqueue(record)
+            return
+        try:
+            loop.call_soon_threadsafe(self._enqueue, record)
+        except RuntimeError:
+            # Loop already closed
+            self._write_records([record])
+
+    def _enqueue(self, record: bytes) -> None:
+        if self._writer is None:
+            # Handed off from a thread just as the log was closed
+            self._write_records([record])
+            return
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            # Writer has fallen behind; never block the event loop on disk
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.error("Audit log %s queue full; %d entries dropped", self.path, self.dropped)
+
+    def start(self) -> None:
+        if self._writer is None:
+            self._loop = asyncio.get_running_loop()
+            self._writer = asyncio.create_task(self._drain())
+
+    async def aclose(self) -> None:
+        # New entries go straight to the file; queued ones are flushed by _drain
+        self._loop = None
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+
+        # A writer cancelled before its first run never reached its finally
+        remaining = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        if remaining:
+            self._write_records(remaining)
+
+        with self._fh_lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    async def _drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch: List[bytes] = []
+        try:
+            while True:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + _FLUSH_INTERVAL
+
+                while len(batch) < _FLUSH_BATCH:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    # asyncio.wait rather than wait_for: wait_for can swallow the
+                    # cancel from aclose() when get() completes at the same time,
+                    # leaving this task (and aclose) waiting forever
+                    getter = asyncio.ensure_future(self._queue.get())
+                    try:
+                        await asyncio.wait((getter,), timeout=remaining)
+                    finally:
+                        got = getter.done()
+                        if got:
+                            batch.append(getter.result())
+                        else:
+                            # Leaves any item in the queue for the final flush
+                            getter.cancel()
+                    if not got:
+                        break
+
+                pending, batch = batch, []
+                await asyncio.to_thread(self._write_records, pending)
+        finally:
+            # Flush whatever is still queued on shutdown
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if batch:
+                self._write_records(batch)
+
+    def _write_records(self, records: List[bytes]) -> None:
+        try:
+            with self._fh_lock:
+                # Kept open for the life of the process; unbuffered so each
+                # batch lands in a single write() call
+                if self._fh is None:
+                    self._fh = open(self.path, "ab", buffering=0)
+                self._fh.write(b"".join(records))
+
+                if self.max_bytes and self._fh.tell() >= self.max_bytes:
+                    self._fh.close()
+                    self._fh = None
+                    os.replace(self.path, self.path + ".1")
+        except Exception as e:
+            logger.error("Audit log write to %s failed: %s", self.path, e)
+
+
+def start_audit_logs() -> None:
+    for log in _registry:
+        log.start()
+
+
+async def close_audit_logs() -> None:
+    for log in _registry:
+        await log.aclose()
@@ -2,12 +2,23 @@
 Shared authentication service
 """
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional, Dict
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache(maxsize=1)
+def pwd_context() -> CryptContext:
+    """Build the bcrypt context on first use instead of at import time"""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__ident="2b",
+        bcrypt__default_rounds=settings.bcrypt_rounds,
+    )
+
 
 class AuthService:
     def __init__(self):
@@ -21,24 +32,25 @@ class AuthService:
         # bcrypt only uses first 72 bytes
         if len(plain_password) > 72:
             plain_password = plain_password[:72]
-        return pwd_context.verify(plain_password, hashed_password)
+        return pwd_context().verify(plain_password, hashed_password)
     
     def get_password_hash(self, password: str) -> str:
         """Generate password hash"""
         # bcrypt only uses first 72 bytes, truncate if needed
         if len(password) > 72:
             password = password[:72]
-        return pwd_context.hash(password)
+        return pwd_context().hash(password)
     
     def create_verification_token(self, user_id: str, email: str) -> str:
         """Create JWT verification token"""
-        expire = datetime.utcnow() + timedelta(hours=settings.verification_token_expire_hours)
+        now = datetime.utcnow()
+        expire = now + timedelta(hours=settings.verification_token_expire_hours)
         payload = {
             "sub": user_id,
             "email": email,
             "purpose": "email_verification",
             "exp": expire,
-            "iat": datetime.utcnow(),
+            "iat": now,
             "type": "verification"
         }
         return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
@@ -53,11 +65,12 @@ class AuthService:
     
     def create_access_token(self, user_id: str) -> str:
         """Create access token for authenticated sessions"""
-        expire = datetime.utcnow() + timedelta(hours=24)
+        now = datetime.utcnow()
+        expire = now + timedelta(hours=24)
         payload = {
             "sub": user_id,
             "exp": expire,
-            "iat": datetime.utcnow(),
+            "iat": now,
             "type": "access"
         }
         return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
@@ -2,17 +2,51 @@
 Shared database service for all microservices
 Combines supabase_client.py and database_service.py
 """
-import requests
-import json
+import asyncio
+import httpx
+import orjson
 import logging
+import time
 from typing import Optional, Dict, Any
 from datetime import datetime, timezone
+from decimal import Decimal
 import uuid
+from types import MappingProxyType
 
 from app.config import settings
+from app.shared.auth import auth_service
 
 logger = logging.getLogger(__name__)
 
+# Read-through cache for user-by-id lookups; update_user evicts the entry
+_USER_TTL_SECONDS = 60
+_USER_CACHE_SIZE = 10_000
+
+
+def _json_default(value):
+    # Decimal amounts go over the wire as exact numeric strings
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _encode_body(data) -> Optional[bytes]:
+    # orjson emits UTF-8 bytes directly; callers always send a JSON Content-Type
+    return orjson.dumps(data, default=_json_default) if data is not None else None
+
+
+# Idle pooled sockets are dropped after this long; the keep-alive ping runs a
+# little more often so live workers always hold a warm, verified connection
+_KEEPALIVE_EXPIRY_SECONDS = 30
+_KEEPALIVE_PING_SECONDS = 25
+
+# Extra connection attempts per request when a pooled socket cannot be opened
+_CONNECT_RETRIES = 2
+
+# Ask PostgREST for the full match count alongside a page of rows
+_COUNT_EXACT = {"Prefer": "count=exact"}
+
+
 # ========== Supabase Client ==========
 class SupabaseClient:
     def __init__(self):
@@ -20,77 +54,241 @@ class SupabaseClient:
         self.anon_key = settings.supabase_anon_key
         self.service_key = settings.supabase_service_role
         
-        self.anon_headers = {
+        # Frozen so they can be shared safely and matched by identity in _route
+        self.anon_headers = MappingProxyType({
             "Authorization": f"Bearer {self.anon_key}",
             "apikey": self.anon_key,
             "Content-Type": "application/json",
             "Prefer": "return=representation"
-        }
+        })
         
-        self.service_headers = {
+        self.service_headers = MappingProxyType({
             "Authorization": f"Bearer {self.service_key}",
             "apikey": self.service_key,
             "Content-Type": "application/json",
             "Prefer": "return=representation"
+        })
+
+        # One pooled client per key, with that key's headers as client defaults;
+        # keeps TCP/TLS connections warm and is safe to share between threads
+        self._clients = {
+            False: self._new_client(httpx.Client, self.anon_headers, keepalive=20, size=50),
+            True: self._new_client(httpx.Client, self.service_headers, keepalive=20, size=50),
         }
+        # user_id -> (fetched_at, user row)
+        self._user_cache = {}
+        # Async counterparts for handlers on the event loop; see _get_aclient
+        self._aclients: Dict[bool, httpx.AsyncClient] = {}
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self._pool_size = settings.supabase_pool_size
+        self._pool_keepalive = min(settings.supabase_pool_keepalive, self._pool_size)
+
+    def _new_client(self, cls, headers, keepalive, size):
+        transport_cls = httpx.AsyncHTTPTransport if cls is httpx.AsyncClient else httpx.HTTPTransport
+        # Pooling and retries live on the transport; retries only cover failed
+        # connects, so a request that reached Supabase is never sent twice
+        transport = transport_cls(
+            http2=True,
+            retries=_CONNECT_RETRIES,
+            limits=httpx.Limits(
+                max_keepalive_connections=keepalive,
+                max_connections=size,
+                keepalive_expiry=_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+        return cls(
+            base_url=self.supabase_url,
+            headers=dict(headers),
+            timeout=10.0,
+            transport=transport,
+        )
+
+    def _get_aclient(self, service: bool) -> httpx.AsyncClient:
+        # Created at startup (or first use) so it binds to the running event loop
+        client = self._aclients.get(service)
+        if client is None or client.is_closed:
+            headers = self.service_headers if service else self.anon_headers
+            client = self._aclients[service] = self._new_client(
+                httpx.AsyncClient, headers, keepalive=self._pool_keepalive, size=self._pool_size
+            )
+        return client
+
+    def _route(self, headers, service):
+        # Calls made with one of the shared header maps go out on the client that
+        # already carries them, so no per-request headers are sent or merged;
+        # any other headers are sent as overrides on top of the chosen key
+        if headers is self.service_headers:
+            service, headers = True, None
+        elif headers is self.anon_headers:
+            headers = None
+        return bool(service), headers
+
+    def start(self) -> None:
+        """Create the shared async clients and keep-alive ping at application startup"""
+        self._get_aclient(False)
+        self._get_aclient(True)
+        if self._keepalive_task is None:
+            self._keepalive_task = asyncio.create_task(self._keepalive_ping())
+
+    async def _keepalive_ping(self) -> None:
+        # A cheap HEAD keeps one connection per key warm and surfaces dead
+        # sockets here rather than on the next user request
+        while True:
+            await asyncio.sleep(_KEEPALIVE_PING_SECONDS)
+            for service in (False, True):
+                try:
+                    await self._get_aclient(service).head("/rest/v1/")
+                except httpx.HTTPError as e:
+                    logger.warning("Supabase keep-alive ping failed: %s", e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool occupancy for the async clients, for the admin health endpoint"""
+        stats = {}
+        for service, client in self._aclients.items():
+            # httpx does not expose pool state publicly; read httpcore's pool
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+            idle = sum(1 for conn in connections if conn.is_idle())
+            stats["service" if service else "anon"] = {
+                "closed": client.is_closed,
+                "max_connections": self._pool_size,
+                "connections": len(connections),
+                "in_use": len(connections) - idle,
+                "idle": idle,
+            }
+        return stats
     
-    def make_request(self, method, endpoint, data=None, headers=None):
-        """Make HTTP request to Supabase"""
-        url = f"{self.supabase_url}{endpoint}"
-        
+    def make_request(self, method, endpoint, data=None, headers=None, *, service=None, params=None):
+        """Make HTTP request to Supabase
+
+        For GET, ``data`` is sent as query parameters; for writes it is the JSON
+        body and ``params`` carries the row filter.
+        """
+        if method not in ("GET", "POST", "PATCH"):
+            raise ValueError(f"Unsupported method: {method}")
+
+        service, headers = self._route(headers, service)
+        client = self._clients[service]
         try:
             if method == "GET":
                 # For GET requests, 'data' should be query parameters
-                # Headers should be passed separately
-                response = requests.get(url, headers=headers, params=data)
-            elif method == "POST":
-                response = requests.post(url, headers=headers, json=data)
-            elif method == "PATCH":
-                response = requests.patch(url, headers=headers, json=data)
+                response = client.get(endpoint, headers=headers, params=data)
             else:
-                raise ValueError(f"Unsupported method: {method}")
-            
+                response = client.request(
+                    method, endpoint, headers=headers, params=params, content=_encode_body(data)
+                )
+        except httpx.HTTPError as e:
+            logger.error(f"Supabase request failed: {e} | URL: {self.supabase_url}{endpoint}")
+            raise
+
+        return self._decode(response, method, endpoint)
+
+    async def amake_request(self, method, endpoint, data=None, headers=None, *, service=None, params=None):
+        """Async variant of make_request for use from async handlers"""
+        if method not in ("GET", "POST", "PATCH"):
+            raise ValueError(f"Unsupported method: {method}")
+
+        service, headers = self._route(headers, service)
+        client = self._get_aclient(service)
+        try:
+            if method == "GET":
+                response = await client.get(endpoint, headers=headers, params=data)
+            else:
+                response = await client.request(
+                    method, endpoint, headers=headers, params=params, content=_encode_body(data)
+                )
+        except httpx.HTTPError as e:
+            logger.error(f"Supabase request failed: {e} | URL: {self.supabase_url}{endpoint}")
+            raise
+
+        return self._decode(response, method, endpoint)
+
+    def _decode(self, response, method, endpoint):
+        # Errors are the rare path; a successful call is one status compare and one parse
+        if response.status_code >= 400:
+            logger.error("Supabase %s %s failed (%s): %s", method, endpoint, response.status_code, response.text)
             response.raise_for_status()
-            
-            # Handle empty response
-            if response.status_code == 204 or not response.content:
-                return []
-            
-            return response.json()
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Supabase request failed: {e} | URL: {url}")
+
+        # 204 No Content and empty representations both mean "no rows"
+        body = response.content
+        return orjson.loads(body) if body else []
+
+    async def aget_with_count(self, endpoint, params=None, *, service=False):
+        """GET a page of rows plus the exact total PostgREST reports in Content-Range"""
+        client = self._get_aclient(service)
+        try:
+            response = await client.get(endpoint, params=params, headers=_COUNT_EXACT)
+        except httpx.HTTPError as e:
+            logger.error(f"Supabase request failed: {e} | URL: {self.supabase_url}{endpoint}")
             raise
+
+        rows = self._decode(response, "GET", endpoint)
+        # Content-Range: 0-49/1234 (or */0 for an empty result)
+        total = response.headers.get("content-range", "").rpartition("/")[2]
+        return rows, int(total) if total.isdigit() else len(rows)
+
+    def close(self):
+        for client in self._clients.values():
+            client.close()
+
+    async def aclose(self):
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            try:
+                await self._keepalive_task
+            except asyncio.CancelledError:
+                pass
+            self._keepalive_task = None
+
+        for client in self._aclients.values():
+            await client.aclose()
+        self._aclients.clear()
     
     # User operations
     def insert_user(self, user_data, use_service_key=True):
         endpoint = "/rest/v1/users"
-        headers = self.service_headers if use_service_key else self.anon_headers
-        return self.make_request("POST", endpoint, user_data, headers=headers)
+        return self.make_request("POST", endpoint, user_data, service=use_service_key)
     
     def get_user_by_email(self, email, use_service_key=False):
         endpoint = "/rest/v1/users"
-        params = {"email": f"eq.{email}"}
-        headers = self.service_headers if use_service_key else self.anon_headers
-        response = self.make_request("GET", endpoint, data=params, headers=headers)
+        params = {"email": f"eq.{email}", "limit": "1"}
+        response = self.make_request("GET", endpoint, data=params, service=use_service_key)
         return response[0] if response else None
     
-    def get_user_by_id(self, user_id, use_service_key=False):
-        endpoint = f"/rest/v1/users?id=eq.{user_id}"
-        headers = self.service_headers if use_service_key else self.anon_headers
-        response = self.make_request("GET", endpoint, headers=headers)
-        return response[0] if response else None
+    def get_user_by_id(self, user_id, use_service_key=False, use_cache=True):
+        now = time.monotonic()
+        cached = self._user_cache.get(user_id) if use_cache else None
+        if cached and now - cached[0] < _USER_TTL_SECONDS:
+            return cached[1]
+
+        endpoint = "/rest/v1/users"
+        params = {"id": f"eq.{user_id}", "limit": "1"}
+        response = self.make_request("GET", endpoint, data=params, service=use_service_key)
+        user = response[0] if response else None
+
+        # Misses are not cached so a newly created user is visible immediately
+        if user is not None:
+            if len(self._user_cache) >= _USER_CACHE_SIZE:
+                self._user_cache.pop(next(iter(self._user_cache)))
+            self._user_cache[user_id] = (now, user)
+        return user
     
     def update_user(self, user_id, updates, use_service_key=True):
-        endpoint = f"/rest/v1/users?id=eq.{user_id}"
-        headers = self.service_headers if use_service_key else self.anon_headers
-        return self.make_request("PATCH", endpoint, updates, headers=headers)
+        endpoint = "/rest/v1/users"
+        params = {"id": f"eq.{user_id}"}
+        try:
+            return self.make_request("PATCH", endpoint, updates, service=use_service_key, params=params)
+        finally:
+            # After the write, so a concurrent read cannot re-cache the old row
+            self.invalidate_user(user_id)
+
+    def invalidate_user(self, user_id):
+        self._user_cache.pop(user_id, None)
     
     def check_email_exists(self, email, use_service_key=False):
         endpoint = "/rest/v1/users"
-        params = {"email": f"eq.{email}", "select": "id"}
-        headers = self.service_headers if use_service_key else self.anon_headers
-        response = self.make_request("GET", endpoint, data=params, headers=headers)
+        params = {"email": f"eq.{email}", "select": "id", "limit": "1"}
+        response = self.make_request("GET", endpoint, data=params, service=use_service_key)
         return len(response) > 0
 
 # ========== Database Service ==========
@@ -103,7 +301,6 @@ class DatabaseService:
         """Create a new user in Supabase"""
         try:
             # Hash the password
-            from app.shared.auth import auth_service
             hashed_password = auth_service.get_password_hash(user_data['password'])
             
             user_record = {
@@ -134,10 +331,10 @@ class DatabaseService:
             logger.error(f"Error getting user by email: {e}")
             return None
     
-    def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """Get user by ID"""
+    def get_user_by_id(self, user_id: str, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Get user by ID; pass use_cache=False when the row must be current"""
         try:
-            return self.supabase.get_user_by_id(user_id, use_service_key=False)
+            return self.supabase.get_user_by_id(user_id, use_service_key=False, use_cache=use_cache)
         except Exception as e:
             logger.error(f"Error getting user by ID: {e}")
             return None
@@ -184,8 +381,9 @@ class DatabaseService:
     def get_wallet_by_user_id(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get wallet by user ID"""
         try:
-            endpoint = f"/rest/v1/wallets?user_id=eq.{user_id}"
-            response = self.supabase.make_request("GET", endpoint, headers=self.supabase.service_headers)
+            endpoint = "/rest/v1/wallets"
+            params = {"user_id": f"eq.{user_id}", "limit": "1"}
+            response = self.supabase.make_request("GET", endpoint, params, self.supabase.service_headers)
             return response[0] if response else None
         except Exception as e:
             logger.error(f"Error getting wallet by user ID: {e}")
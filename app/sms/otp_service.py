@@ -2,8 +2,8 @@
 OTP Service
 """
 
-import random
-import string
+import hmac
+import secrets
 from datetime import datetime, timedelta, timezone
 import logging
 from typing import Optional
@@ -16,12 +16,14 @@ logger = logging.getLogger(__name__)
 class OTPService:
     def __init__(self):
         self.otp_length = 6
+        self._otp_space = 10 ** self.otp_length
 
     # ---------------------------------------------------------
     # OTP Generate / Expire / Validate
     # ---------------------------------------------------------
     def generate_otp(self) -> str:
-        return "".join(random.choices(string.digits, k=self.otp_length))
+        # One CSPRNG draw over the whole code space, zero-padded to length
+        return f"{secrets.randbelow(self._otp_space):0{self.otp_length}d}"
 
     def get_otp_expiry(self) -> datetime:
         return datetime.now(timezone.utc) + timedelta(minutes=settings.otp_expiry_minutes)
@@ -31,6 +33,11 @@ class OTPService:
             if not stored_otp or not stored_expiry or not user_otp:
                 return False
 
+            # Reject malformed codes before paying for the expiry parse
+            candidate = user_otp.strip()
+            if len(candidate) != self.otp_length or not candidate.isdigit():
+                return False
+
             if isinstance(stored_expiry, str):
                 stored_expiry = datetime.fromisoformat(stored_expiry.replace("Z", "+00:00"))
 
@@ -40,7 +47,7 @@ class OTPService:
             if stored_expiry < datetime.now(timezone.utc):
                 return False
 
-            return stored_otp.strip() == user_otp.strip()
+            return hmac.compare_digest(stored_otp.strip(), candidate)
 
         except Exception as e:
             logger.error(f"OTP validation error: {e}")
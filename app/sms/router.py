@@ -13,7 +13,7 @@ router = APIRouter(tags=["sms"])
 # ---------------------------------------------------------
 @router.get("/test-sms")
 async def test_sms():
-    result = sms_service.test_connection()
+    result = await sms_service.test_connection()
     return {
         "success": result["success"],
         "message": "SMS service test",
@@ -2,24 +2,84 @@
 SMS Service (WinSMS)
 """
 
-import os
-import urllib.parse
+import asyncio
 import logging
+import random
+import re
+import time
 from datetime import datetime, timezone
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 import httpx
-import json
 
 from app.config import settings
+from app.shared.audit_log import AuditLog
 
 logger = logging.getLogger(__name__)
 
+# Every byte except ASCII 0-9, for stripping phone numbers in one C-level pass
+_NON_DIGITS = bytes(range(256)).translate(None, b"0123456789")
+
+# South African MSISDN: 27 followed by nine digits
+_ZA_MSISDN = re.compile(r"27[0-9]{9}").fullmatch
+
+_DEBUG_LOG_MAX_BYTES = 10 * 1024 * 1024  # rolled over to sms_debug.log.1
+_DEBUG_BANNER = "\n" + "=" * 60 + "\n📱 SMS DEBUG → %s\nOTP: %s\n" + "=" * 60
+_sms_debug_log = AuditLog("logs/sms_debug.log", max_bytes=_DEBUG_LOG_MAX_BYTES)
+
+# Live WinSMS probes send a real message; reuse a successful result for 5
+# minutes, a failed one only briefly so a transient error clears quickly
+_PROBE_TTL_SECONDS = 300
+_PROBE_FAILURE_TTL_SECONDS = 15
+
+# Transient network failures are retried after ~50/150 ms (jittered) before
+# the caller falls back. Read timeouts are not retried: the gateway may
+# already have accepted the message.
+_NETWORK_ATTEMPTS = 3
+_NETWORK_BACKOFF = 0.05
+
+# WinSMS error codes, keyed by the raw bytes found after "<number>="
+_KNOWN_ERRORS = {
+    b"INSUFFICIENT CREDITS": "Insufficient SMS credits",
+    b"ACCOUNTLOCKED": "SMS account locked",
+    b"BADDEST": "Invalid phone number",
+    b"INVALIDUSER": "Invalid SMS credentials",
+    b"NOCREDIT": "No credit available",
+}
+
+# (max_connections, max_keepalive_connections) per deployment profile
+_POOL_PRESETS = {
+    "realtime": (20, 10),
+    "batch": (100, 100),
+}
+
+
+def _retry_after_seconds(response: httpx.Response, default: float = 1.0, cap: float = 10.0) -> float:
+    try:
+        return min(float(response.headers.get("Retry-After", default)), cap)
+    except ValueError:
+        return default
+
+
+@lru_cache(maxsize=4096)
+def _normalize_phone_number(phone_number: str) -> str:
+    # Resend flows clean the same handful of numbers repeatedly
+    digits = phone_number.encode("ascii", "ignore").translate(None, _NON_DIGITS).decode("ascii")
+    # Local "0XX..." becomes "27XX..."; anything else (including "27...") passes through
+    return "27" + digits[1:] if digits[:1] == "0" else digits
+
 
 class SMSService:
     def __init__(self):
-        self.sms_user = os.getenv("SMS_USER", settings.sms_user)
-        self.sms_password = os.getenv("SMS_PASSWORD", settings.sms_password)
+        self.sms_user = settings.sms_user
+        self.sms_password = settings.sms_password
         self.api_url = settings.sms_api_url
+        self._api_base = self.api_url.rstrip("/")
+        self._auth_params = {"User": self.sms_user, "Password": self.sms_password}
+        self._msg_template = (
+            "Your Detour verification code is: {otp}. "
+            f"Valid for {settings.otp_expiry_minutes} minutes."
+        )
 
         if not self.sms_user or not self.sms_password:
             logger.warning("SMS credentials missing")
@@ -28,20 +88,53 @@ class SMSService:
             self.initialized = True
             logger.info("SMS Service initialized")
 
+        pool_size, keepalive = _POOL_PRESETS.get(settings.sms_pool_mode, _POOL_PRESETS["realtime"])
+        self._pool_size = settings.sms_pool_size or pool_size
+        self._pool_keepalive = min(settings.sms_pool_keepalive or keepalive, self._pool_size)
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self._probe_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+
+    # ---------------------------------------------------------
+    # Shared HTTP Client
+    # ---------------------------------------------------------
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                # Fail fast on connect and on waiting for a pooled connection so a
+                # login storm degrades to the fallback instead of queueing for 30 s
+                timeout=httpx.Timeout(30.0, connect=5.0, pool=5.0),
+                limits=httpx.Limits(
+                    max_keepalive_connections=self._pool_keepalive,
+                    max_connections=self._pool_size,
+                    keepalive_expiry=60,
+                ),
+            )
+        return self._client
+
+    def start(self) -> None:
+        """Create the shared client at application startup"""
+        if self.initialized and not settings.debug:
+            self._get_client()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
     # ---------------------------------------------------------
     # Public Entry (Unified OTP Sender)
     # ---------------------------------------------------------
-    def send_otp_sms(self, phone_number: str, otp_code: str, user_name: str = "User") -> Dict[str, Any]:
+    async def send_otp_sms(self, phone_number: str, otp_code: str, user_name: str = "User") -> Dict[str, Any]:
         try:
             cleaned = self._clean_phone_number(phone_number)
 
             if not self._validate_phone_number(cleaned):
                 return {"success": False, "error": "Invalid phone number", "simulated": True}
 
-            message = (
-                f"Your Detour verification code is: {otp_code}. "
-                f"Valid for {settings.otp_expiry_minutes} minutes."
-            )
+            message = self._msg_template.format_map({"otp": otp_code})
 
             # REAL SEND if initialized
             if self.initialized:
@@ -51,11 +144,11 @@ class SMSService:
                     return self._debug_send(cleaned, otp_code, message)
 
                 # Try real SMS
-                result = self._send_via_winsms(cleaned, message)
+                result = await self._send_via_winsms(cleaned, message)
 
                 # Fallback → debug
                 if not result["success"]:
-                    logger.warning(f"SMSGateway failed, fallback to debug → {result.get('error')}")
+                    logger.warning("SMSGateway failed, fallback to debug → %s", result.get("error"))
                     return self._debug_send(cleaned, otp_code, message)
 
                 return result
@@ -64,107 +157,197 @@ class SMSService:
             return self._debug_send(cleaned, otp_code, message)
 
         except Exception as e:
-            logger.error(f"SMS error: {e}")
+            logger.error("SMS error: %s", e)
             return self._debug_send(phone_number, otp_code, str(e))
 
     # ---------------------------------------------------------
     # Phone Utilities
     # ---------------------------------------------------------
     def _clean_phone_number(self, phone_number: str) -> str:
-        digits = "".join(filter(str.isdigit, phone_number))
-        if digits.startswith("27"):
-            return digits
-        if digits.startswith("0"):
-            return "27" + digits[1:]
-        return digits
+        return _normalize_phone_number(phone_number)
 
     def _validate_phone_number(self, phone_number: str) -> bool:
-        digits = "".join(filter(str.isdigit, phone_number))
-        return len(digits) == 11 and digits.startswith("27")
+        # Expects the output of _clean_phone_number
+        return _ZA_MSISDN(phone_number) is not None
 
     # ---------------------------------------------------------
     # WinSMS Sender
     # ---------------------------------------------------------
-    def _send_via_winsms(self, phone_number: str, message: str) -> Dict[str, Any]:
+    async def _send_via_winsms(self, phone_number: str, message: str) -> Dict[str, Any]:
         try:
-            params = {
-                "User": self.sms_user,
-                "Password": self.sms_password,
-                "Message": message,
-                "Numbers": phone_number,
-            }
-
-            url = f"{self.api_url.rstrip('/')}?{urllib.parse.urlencode(params)}"
-
-            with httpx.Client(timeout=30.0) as client:
-                response = client.get(url)
-                response_text = response.text.strip()
-
-            # Response parsing
-            if "=" in response_text:
-                _, result = response_text.split("=", 1)
-                result = result.replace("&", "").strip()
-
-                known_errors = {
-                    "INSUFFICIENT CREDITS": "Insufficient SMS credits",
-                    "ACCOUNTLOCKED": "SMS account locked",
-                    "BADDEST": "Invalid phone number",
-                    "INVALIDUSER": "Invalid SMS credentials",
-                    "NOCREDIT": "No credit available",
-                }
-
-                if result in known_errors:
-                    return {"success": False, "error": known_errors[result], "simulated": False}
-
-                return {
-                    "success": True,
-                    "message_id": result,
-                    "phone_number": phone_number,
-                    "simulated": False,
-                }
+            params = {**self._auth_params, "Message": message, "Numbers": phone_number}
+
+            response = await self._winsms_get(params)
 
+            # Response parsing: "<number>=<message id or error code>&"
+            _, sep, tail = response.content.partition(b"=")
+            if sep:
+                return self._winsms_result(phone_number, tail.partition(b"&")[0].strip())
+
+            response_text = response.content.strip().decode("utf-8", "replace")
             return {"success": False, "error": f"Unexpected response: {response_text}", "simulated": False}
 
         except httpx.RequestError as e:
             return {"success": False, "error": f"Network error: {e}", "simulated": False}
 
+    async def _winsms_get(self, params: Dict[str, str]) -> httpx.Response:
+        client = self._get_client()
+        for attempt in range(_NETWORK_ATTEMPTS):
+            try:
+                response = await client.get(self._api_base, params=params)
+                break
+            except httpx.ReadTimeout:
+                raise
+            except httpx.RequestError as e:
+                if attempt == _NETWORK_ATTEMPTS - 1:
+                    raise
+                delay = _NETWORK_BACKOFF * 3 ** attempt * random.uniform(0.5, 1.5)
+                logger.warning("WinSMS request failed (%s), retrying in %.0f ms", e, delay * 1000)
+                await asyncio.sleep(delay)
+
+        # Gateway throttling: wait as instructed, then try once more
+        if response.status_code == 429:
+            await asyncio.sleep(_retry_after_seconds(response))
+            response = await client.get(self._api_base, params=params)
+
+        return response
+
+    def _winsms_result(self, phone_number: str, result: bytes) -> Dict[str, Any]:
+        error = _KNOWN_ERRORS.get(result)
+        if error:
+            return {"success": False, "error": error, "phone_number": phone_number, "simulated": False}
+
+        return {
+            "success": True,
+            "message_id": result.decode("ascii", "replace"),
+            "phone_number": phone_number,
+            "simulated": False,
+        }
+
+    # ---------------------------------------------------------
+    # Concurrent OTP Fan-out
+    # ---------------------------------------------------------
+    async def send_many_otps(self, items: List[Tuple[str, str]]) -> List[Any]:
+        """Send (phone_number, otp_code) pairs concurrently, bounded by the pool size"""
+        semaphore = asyncio.Semaphore(self._pool_size)
+
+        async def _send_one(phone_number: str, otp_code: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.send_otp_sms(phone_number, otp_code)
+
+        return await asyncio.gather(
+            *(_send_one(phone, code) for phone, code in items),
+            return_exceptions=True,
+        )
+
+    # ---------------------------------------------------------
+    # Bulk Sender (one WinSMS call per message body per batch)
+    # ---------------------------------------------------------
+    async def send_bulk_sms(self, messages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Send (phone_number, message) pairs.
+        Recipients sharing a message body are coalesced into one request
+        per settings.sms_batch_size numbers; batches go out concurrently.
+        """
+        results: List[Dict[str, Any]] = []
+        groups: Dict[str, List[str]] = {}
+
+        for phone_number, message in messages:
+            cleaned = self._clean_phone_number(phone_number)
+            if not self._validate_phone_number(cleaned):
+                results.append({"success": False, "error": "Invalid phone number", "phone_number": phone_number, "simulated": True})
+                continue
+            groups.setdefault(message, []).append(cleaned)
+
+        if not self.initialized or settings.debug:
+            for message, numbers in groups.items():
+                results.extend(self._debug_send(number, "", message) for number in numbers)
+            return results
+
+        size = settings.sms_batch_size
+        batches = await asyncio.gather(*(
+            self._send_bulk_via_winsms(numbers[i:i + size], message)
+            for message, numbers in groups.items()
+            for i in range(0, len(numbers), size)
+        ))
+
+        for batch in batches:
+            results.extend(batch)
+        return results
+
+    async def send_bulk(self, phone_numbers: List[str], message: str) -> List[Dict[str, Any]]:
+        """Send one message to many recipients via the comma-separated Numbers field"""
+        return await self.send_bulk_sms([(phone_number, message) for phone_number in phone_numbers])
+
+    async def _send_bulk_via_winsms(self, numbers: List[str], message: str) -> List[Dict[str, Any]]:
+        try:
+            params = {**self._auth_params, "Message": message, "Numbers": ",".join(numbers)}
+
+            response = await self._winsms_get(params)
+
+        except httpx.RequestError as e:
+            return [{"success": False, "error": f"Network error: {e}", "phone_number": n, "simulated": False} for n in numbers]
+
+        # WinSMS answers with one "number=result" pair per recipient, "&"-separated
+        by_number = {}
+        for pair in response.content.split(b"&"):
+            number, sep, result = pair.partition(b"=")
+            if sep:
+                by_number[number.strip().decode("ascii", "replace")] = result.strip()
+
+        results = []
+        for n in numbers:
+            if n in by_number:
+                results.append(self._winsms_result(n, by_number[n]))
+            else:
+                response_text = response.content.strip().decode("utf-8", "replace")
+                results.append({"success": False, "error": f"Unexpected response: {response_text}", "phone_number": n, "simulated": False})
+        return results
+
     # ---------------------------------------------------------
     # Debug SMS Logger
     # ---------------------------------------------------------
     def _debug_send(self, phone_number: str, otp_code: str, message: str) -> Dict[str, Any]:
         debug = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
             "mode": "DEBUG" if settings.debug else "FALLBACK",
             "phone_number": phone_number,
             "otp": otp_code,
         }
 
-        print("\n" + "=" * 60)
-        print(f"📱 SMS DEBUG → {phone_number}")
-        print(f"OTP: {otp_code}")
-        print("=" * 60 + "\n")
+        logger.debug(_DEBUG_BANNER, phone_number, otp_code)
 
-        try:
-            with open("logs/sms_debug.log", "a", encoding="utf-8") as f:
-                f.write(json.dumps(debug, indent=2))
-                f.write("\n" + ("-" * 50) + "\n")
-        except Exception as e:
-            logger.error(f"SMS debug logging failed: {e}")
+        _sms_debug_log.write(debug)
 
         return {"success": True, "simulated": True, "phone_number": phone_number}
 
     # ---------------------------------------------------------
     # Connection Test
     # ---------------------------------------------------------
-    def test_connection(self) -> Dict[str, Any]:
+    async def test_connection(self) -> Dict[str, Any]:
         if not self.initialized:
             return {"success": False, "error": "SMS credentials not configured"}
 
+        now = time.monotonic()
+        # (expires_at, result) on the monotonic clock
+        if self._probe_cache and now < self._probe_cache[0]:
+            return self._probe_cache[1]
+
         try:
-            test = self._send_via_winsms("27721234567", "Test SMS from Detour API")
-            return {"success": test["success"], "error": test.get("error"), "initialized": True}
+            test = await self._send_via_winsms("27721234567", "Test SMS from Detour API")
+            result = {"success": test["success"], "error": test.get("error"), "initialized": True}
         except Exception as e:
-            return {"success": False, "error": str(e)}
+            result = {"success": False, "error": str(e)}
+
+        ttl = _PROBE_TTL_SECONDS if result["success"] else _PROBE_FAILURE_TTL_SECONDS
+        self._probe_cache = (now + ttl, result)
+        return result
+
+
+@lru_cache(maxsize=1)
+def get_sms_service() -> SMSService:
+    """Process-wide SMSService, usable as a FastAPI dependency"""
+    return SMSService()
 
 
-sms_service = SMSService()
+sms_service = get_sms_service()
@@ -2,7 +2,7 @@
 Subscription Router
 """
 
-from fastapi import APIRouter
+from fastapi import APIRouter, BackgroundTasks
 from app.subscriptions.schemas import (
     CreatePackageRequest,
     ActivateSubscriptionRequest,
@@ -11,7 +11,7 @@ from app.subscriptions.schemas import (
 )
 from app.subscriptions.service import subscription_service
 from app.advances.service import advances_service
-from app.auth.schemas import SuccessResponse
+from app.auth.schemas import SuccessResponse, ok
 from app.shared.database import database_service
 
 router = APIRouter(tags=["subscriptions"])
@@ -23,7 +23,7 @@ router = APIRouter(tags=["subscriptions"])
 @router.post("/package/create", response_model=SuccessResponse)
 async def create_package(req: CreatePackageRequest):
     result = subscription_service.create_package(req)
-    return SuccessResponse(**result)
+    return ok(result)
 
 
 # ---------------------------------------------------------
@@ -62,27 +62,27 @@ async def get_user_subscription(user_id: str):
 # User: Activate Subscription (NO PAYMENT)
 # ---------------------------------------------------------
 @router.post("/activate", response_model=SuccessResponse)
-async def activate_subscription(req: ActivateSubscriptionRequest):
-    result = subscription_service.activate_subscription(req.user_id, req.package_id)
-    return SuccessResponse(**result)
+async def activate_subscription(req: ActivateSubscriptionRequest, background_tasks: BackgroundTasks):
+    result = subscription_service.activate_subscription(req.user_id, req.package_id, background_tasks)
+    return ok(result)
 
 
 # ---------------------------------------------------------
 # User: Upgrade Subscription
 # ---------------------------------------------------------
 @router.post("/upgrade", response_model=SuccessResponse)
-async def upgrade_subscription(req: SubscriptionUpdateRequest):
-    result = subscription_service.upgrade_subscription(req.user_id, req.package_id)
-    return SuccessResponse(**result)
+async def upgrade_subscription(req: SubscriptionUpdateRequest, background_tasks: BackgroundTasks):
+    result = subscription_service.upgrade_subscription(req.user_id, req.package_id, background_tasks)
+    return ok(result)
 
 
 # ---------------------------------------------------------
 # User: Downgrade Subscription
 # ---------------------------------------------------------
 @router.post("/downgrade", response_model=SuccessResponse)
-async def downgrade_subscription(req: SubscriptionUpdateRequest):
-    result = subscription_service.downgrade_subscription(req.user_id, req.package_id)
-    return SuccessResponse(**result)
+async def downgrade_subscription(req: SubscriptionUpdateRequest, background_tasks: BackgroundTasks):
+    result = subscription_service.downgrade_subscription(req.user_id, req.package_id, background_tasks)
+    return ok(result)
 
 
 # ---------------------------------------------------------
@@ -91,7 +91,7 @@ async def downgrade_subscription(req: SubscriptionUpdateRequest):
 @router.post("/cancel", response_model=SuccessResponse)
 async def cancel_subscription(req: CancelSubscriptionRequest):
     result = subscription_service.cancel_subscription(req.user_id, req.reason)
-    return SuccessResponse(**result)
+    return ok(result)
 
 
 # ---------------------------------------------------------
@@ -140,7 +140,7 @@ async def run_weekly_billing():
       ✓ Update revenue pool
       ✓ Log subscription event
     """
-    results = subscription_service.bill_all_users()
+    results = await subscription_service.bill_all_users()
 
     return SuccessResponse(
         success=True,
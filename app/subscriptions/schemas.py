@@ -5,6 +5,8 @@ Subscription Schemas
 from pydantic import BaseModel, Field
 from typing import Optional, List
 
+from app.auth.schemas import SuccessResponse
+
 
 # ---------------------------------------------------------
 # Admin: Create Package
@@ -47,7 +49,6 @@ class SubscriptionUpdateRequest(BaseModel):
 # ---------------------------------------------------------
 # Generic Response Model
 # ---------------------------------------------------------
-class SubscriptionResponse(BaseModel):
-    success: bool
-    message: str
-    data: Optional[dict] = None
+# Same shape as the shared SuccessResponse the router already returns;
+# alias it rather than building a second identical model
+SubscriptionResponse = SuccessResponse
@@ -2,43 +2,114 @@
 Subscription Service
 """
 
+import asyncio
+import logging
+import time
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from decimal import Decimal
+from typing import Optional
+
+import httpx
+from fastapi import BackgroundTasks
 
 from app.shared.database import database_service
 from app.email.service import email_service
+from app.wallet.service import wallet_service
 from .utils import get_next_friday
 
+logger = logging.getLogger(__name__)
+
+# Upper bound on wallet debits in flight during the weekly billing run,
+# and the number of subscriptions fetched per page
+_BILLING_CONCURRENCY = 32
+_BILLING_PAGE_SIZE = 1000
+
+# Read-path caches for the limits/subscription endpoints
+_SUBSCRIPTION_TTL_SECONDS = 30
+_SUBSCRIPTION_CACHE_SIZE = 10_000
+_PACKAGE_TTL_SECONDS = 60
+
+# Errors raised by activate_subscription_tx; PostgREST returns them as a 400
+# with the exception text in "message"
+_ACTIVATION_ERRORS = (
+    "User already has an active subscription",
+    "Subscription package not found",
+)
+
 
 class SubscriptionService:
+    def __init__(self):
+        # user_id -> (fetched_at, subscription or None)
+        self._subscription_cache = {}
+        # package_id -> package; the whole table is reloaded once it goes stale
+        self._package_cache = {}
+        self._packages_loaded_at = 0.0
 
     # ---------------------------------------------------------
     # Active Subscription Lookup
     # ---------------------------------------------------------
-    def get_active_subscription(self, user_id: str):
+    def get_active_subscription(self, user_id: str, use_cache: bool = True):
+        now = time.monotonic()
+        if use_cache:
+            cached = self._subscription_cache.get(user_id)
+            if cached and now - cached[0] < _SUBSCRIPTION_TTL_SECONDS:
+                return cached[1]
+
         result = database_service.supabase.make_request(
             method="GET",
             endpoint=f"/rest/v1/user_subscriptions?user_id=eq.{user_id}&is_active=eq.true",
             headers=database_service.supabase.service_headers,
         )
-        return result[0] if result else None
+        sub = result[0] if result else None
+
+        if len(self._subscription_cache) >= _SUBSCRIPTION_CACHE_SIZE:
+            self._subscription_cache.pop(next(iter(self._subscription_cache)))
+        self._subscription_cache[user_id] = (now, sub)
+        return sub
+
+    def invalidate_user(self, user_id: str):
+        self._subscription_cache.pop(user_id, None)
 
     # ---------------------------------------------------------
     # Package Lookup
     # ---------------------------------------------------------
     def get_package(self, package_id: str):
+        if time.monotonic() - self._packages_loaded_at >= _PACKAGE_TTL_SECONDS:
+            self.load_packages()
+
+        cached = self._package_cache.get(package_id)
+        if cached:
+            return cached
+
+        # Not in the last snapshot (e.g. created by another worker since)
         pkg = database_service.supabase.make_request(
             method="GET",
             endpoint=f"/rest/v1/subscription_packages?id=eq.{package_id}",
             headers=database_service.supabase.service_headers,
         )
-        return pkg[0] if pkg else None
+        if not pkg:
+            return None
+
+        self._package_cache[package_id] = pkg[0]
+        return pkg[0]
+
+    def load_packages(self):
+        """Fetch every package in one query and refresh the package cache"""
+        packages = database_service.supabase.make_request(
+            method="GET",
+            endpoint="/rest/v1/subscription_packages",
+            headers=database_service.supabase.service_headers,
+        )
+        self._package_cache = {pkg["id"]: pkg for pkg in packages or []}
+        self._packages_loaded_at = time.monotonic()
+        return self._package_cache
 
     # ---------------------------------------------------------
     # Create Subscription Package
     # ---------------------------------------------------------
     def create_package(self, req):
+        now = datetime.now(timezone.utc).isoformat()
         data = {
             "id": str(uuid.uuid4()),
             "name": req.name,
@@ -50,8 +121,8 @@ class SubscriptionService:
             "advance_percentage": req.advance_percentage,
             "auto_repay_rate": req.auto_repay_rate,
             "is_active": True,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
+            "created_at": now,
+            "updated_at": now,
         }
 
         saved = database_service.supabase.make_request(
@@ -61,6 +132,8 @@ class SubscriptionService:
             headers=database_service.supabase.service_headers,
         )
 
+        self._package_cache[saved[0]["id"]] = saved[0]
+
         return {
             "success": True,
             "message": "Subscription package created",
@@ -70,8 +143,9 @@ class SubscriptionService:
     # ---------------------------------------------------------
     # Activate Subscription (NO PAYMENT)
     # ---------------------------------------------------------
-    def activate_subscription(self, user_id: str, package_id: str):
-        existing = self.get_active_subscription(user_id)
+    def activate_subscription(self, user_id: str, package_id: str, background_tasks: Optional[BackgroundTasks] = None):
+        # Write paths always check the database, never the read cache
+        existing = self.get_active_subscription(user_id, use_cache=False)
         if existing:
             return {"success": False, "message": "User already has an active subscription"}
 
@@ -79,36 +153,34 @@ class SubscriptionService:
         if not pkg:
             return {"success": False, "message": "Subscription package not found"}
 
-        price = float(pkg["price"])
-
-        subscription_row = {
-            "id": str(uuid.uuid4()),
-            "user_id": user_id,
-            "package_id": package_id,
-            "is_active": True,
-            "start_date": datetime.utcnow().date().isoformat(),
-            "renewal_period": "weekly",
-            "current_weekly_price": price,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
-        }
-
-        saved_sub = database_service.supabase.make_request(
-            method="POST",
-            endpoint="/rest/v1/user_subscriptions",
-            data=subscription_row,
-            headers=database_service.supabase.service_headers,
-        )
-
-        self.log_event(user_id, package_id, "activated")
-        
-        # Send confirmation email using the correct method
+        # Subscription row + "activated" event in one transaction; the function
+        # re-checks for an active subscription under a per-user lock
         try:
-            self.send_confirmation_email(user_id, pkg)
-        except Exception as e:
-            print(f"Warning: Could not send confirmation email: {e}")
-            # Log the email failure but don't fail the subscription activation
-            self.log_event(user_id, package_id, "email_failed", {"error": str(e)})
+            saved_sub = database_service.supabase.make_request(
+                method="POST",
+                endpoint="/rest/v1/rpc/activate_subscription_tx",
+                data={"p_user": user_id, "p_pkg": package_id},
+                headers=database_service.supabase.service_headers,
+            )
+        except httpx.HTTPStatusError as e:
+            # A concurrent activation (or a package deleted since the check
+            # above) is refused inside the function, not by a 5xx
+            try:
+                message = e.response.json().get("message")
+            except ValueError:
+                message = None
+            if message not in _ACTIVATION_ERRORS:
+                raise
+            self.invalidate_user(user_id)
+            return {"success": False, "message": message}
+        self.invalidate_user(user_id)
+
+        # Confirmation email goes out after the response when the caller
+        # hands us its BackgroundTasks
+        if background_tasks is not None:
+            background_tasks.add_task(self._send_confirmation_email_logged, user_id, package_id, pkg)
+        else:
+            self._send_confirmation_email_logged(user_id, package_id, pkg)
 
         return {"success": True, "message": "Subscription activated", "data": saved_sub[0]}
 
@@ -116,15 +188,16 @@ class SubscriptionService:
     # Cancel Subscription
     # ---------------------------------------------------------
     def cancel_subscription(self, user_id: str, reason: str = None):
-        sub = self.get_active_subscription(user_id)
+        sub = self.get_active_subscription(user_id, use_cache=False)
         if not sub:
             return {"success": False, "message": "No active subscription to cancel"}
 
+        now = datetime.now(timezone.utc).isoformat()
         update = {
             "is_active": False,
-            "cancelled_at": datetime.utcnow().isoformat(),
+            "cancelled_at": now,
             "cancellation_reason": reason,
-            "updated_at": datetime.utcnow().isoformat(),
+            "updated_at": now,
         }
 
         database_service.supabase.make_request(
@@ -133,6 +206,7 @@ class SubscriptionService:
             data=update,
             headers=database_service.supabase.service_headers,
         )
+        self.invalidate_user(user_id)
 
         self.log_event(user_id, sub["package_id"], "cancelled", {"reason": reason})
 
@@ -141,8 +215,8 @@ class SubscriptionService:
     # ---------------------------------------------------------
     # Upgrade Subscription
     # ---------------------------------------------------------
-    def upgrade_subscription(self, user_id: str, package_id: str):
-        active = self.get_active_subscription(user_id)
+    def upgrade_subscription(self, user_id: str, package_id: str, background_tasks: Optional[BackgroundTasks] = None):
+        active = self.get_active_subscription(user_id, use_cache=False)
         if not active:
             return {"success": False, "message": "No active subscription"}
 
@@ -159,7 +233,7 @@ class SubscriptionService:
         self.cancel_subscription(user_id, "upgrade")
 
         # Activate new sub
-        result = self.activate_subscription(user_id, package_id)
+        result = self.activate_subscription(user_id, package_id, background_tasks)
 
         self.log_event(user_id, package_id, "upgraded")
 
@@ -168,8 +242,8 @@ class SubscriptionService:
     # ---------------------------------------------------------
     # Downgrade Subscription
     # ---------------------------------------------------------
-    def downgrade_subscription(self, user_id: str, package_id: str):
-        active = self.get_active_subscription(user_id)
+    def downgrade_subscription(self, user_id: str, package_id: str, background_tasks: Optional[BackgroundTasks] = None):
+        active = self.get_active_subscription(user_id, use_cache=False)
         if not active:
             return {"success": False, "message": "No active subscription"}
 
@@ -186,7 +260,7 @@ class SubscriptionService:
         self.cancel_subscription(user_id, "downgrade")
 
         # Activate new sub
-        result = self.activate_subscription(user_id, package_id)
+        result = self.activate_subscription(user_id, package_id, background_tasks)
 
         self.log_event(user_id, package_id, "downgraded")
 
@@ -195,109 +269,142 @@ class SubscriptionService:
     # ---------------------------------------------------------
     # Weekly Billing (Cron) – FULLY FIXED
     # ---------------------------------------------------------
-    def bill_all_users(self):
+    async def bill_all_users(self):
+        # Wallet debits are independent per user; overlap their round trips
+        semaphore = asyncio.Semaphore(_BILLING_CONCURRENCY)
+        now = datetime.now(timezone.utc).isoformat()
+
+        # Start billing each page while the next one is being fetched
+        page_tasks = []
+        offset = 0
+        while True:
+            subs = await asyncio.to_thread(self._get_active_subscriptions_page, offset)
+            if subs:
+                page_tasks.append(asyncio.create_task(self._bill_page(subs, semaphore, now)))
+            if len(subs) < _BILLING_PAGE_SIZE:
+                break
+            offset += _BILLING_PAGE_SIZE
+
+        results = []
+        events = []
+        revenue_total = 0.0
+
+        for outcomes in await asyncio.gather(*page_tasks):
+            for result, event, amount in outcomes:
+                results.append(result)
+                if event:
+                    events.append(event)
+                revenue_total += amount
+
+        await asyncio.to_thread(self._record_billing_run, events, revenue_total)
+
+        return results
+
+    def _get_active_subscriptions_page(self, offset: int):
         subs = database_service.supabase.make_request(
             method="GET",
-            endpoint="/rest/v1/user_subscriptions?is_active=eq.true",
+            endpoint=(
+                "/rest/v1/user_subscriptions?is_active=eq.true"
+                f"&order=id&limit={_BILLING_PAGE_SIZE}&offset={offset}"
+            ),
             headers=database_service.supabase.service_headers,
         )
+        return subs or []
+
+    async def _bill_page(self, subs, semaphore, now):
+        # One lookup per page, only to skip subscribers without a wallet; the
+        # balance itself is checked and debited in the database
+        wallets = await asyncio.to_thread(self._get_wallets_by_user_ids, [sub["user_id"] for sub in subs])
+
+        async def _bill(sub):
+            async with semaphore:
+                return await self._bill_user(sub, wallets.get(sub["user_id"]), now)
+
+        return await asyncio.gather(*(_bill(sub) for sub in subs))
+
+    async def _bill_user(self, sub, wallet, now):
+        """Debit one subscriber; returns (result, event, amount charged)"""
+        user_id = sub["user_id"]
+        package_id = sub["package_id"]
+        price = Decimal(str(sub["current_weekly_price"]))
+
+        if not wallet:
+            return {"user_id": user_id, "status": "missing_wallet"}, None, 0.0
+
+        # Funds check, debit and ledger row commit together in wallet_apply
+        debit = await wallet_service.apply_funds(
+            wallet["id"],
+            -price,
+            "payment",
+            "Weekly subscription billing",
+            reference=f"SUB-{package_id}",
+            metadata={"source": "cron", "package_id": package_id},
+        )
 
-        results = []
-
-        for sub in subs:
-            user_id = sub["user_id"]
-            package_id = sub["package_id"]
-            amount = float(sub["current_weekly_price"])
+        # ---------------------------------------------------
+        # DEBIT REJECTED (INSUFFICIENT FUNDS / NO WALLET / ERROR)
+        # ---------------------------------------------------
+        if not debit["success"]:
+            if debit["message"] == "Insufficient funds":
+                event = self._event_row(user_id, package_id, "failed_payment", {"reason": "insufficient_funds"}, now)
+                return {"user_id": user_id, "status": "insufficient_funds"}, event, 0.0
+            if debit["message"] == "Wallet not found":
+                return {"user_id": user_id, "status": "missing_wallet"}, None, 0.0
+
+            logger.error(f"Weekly billing failed for user {user_id}: {debit['message']}")
+            return {"user_id": user_id, "status": "error"}, None, 0.0
+
+        amount = float(price)
+        event = self._event_row(user_id, package_id, "weekly_deduction", {"amount": amount}, now)
+
+        return {"user_id": user_id, "status": "charged"}, event, amount
+
+    def _record_billing_run(self, events, revenue_total):
+        # Ledger rows were written with each debit; only the revenue sum and
+        # the events are batched for the whole run
+        if revenue_total:
+            self.add_to_revenue(revenue_total)
+
+        if events:
+            database_service.supabase.make_request(
+                method="POST",
+                endpoint="/rest/v1/subscription_events",
+                data=events,
+                headers=database_service.supabase.service_headers,
+            )
 
-            # FIXED WALLET LOOKUP
-            wallet_data = database_service.supabase.make_request(
+    def _get_wallets_by_user_ids(self, user_ids, chunk_size: int = 100):
+        """Fetch wallets keyed by user_id, chunked to keep the in.() filter URL short"""
+        wallets = {}
+        for i in range(0, len(user_ids), chunk_size):
+            chunk = ",".join(user_ids[i:i + chunk_size])
+            rows = database_service.supabase.make_request(
                 method="GET",
-                endpoint=f"/rest/v1/wallets?user_id=eq.{user_id}",
+                endpoint=f"/rest/v1/wallets?select=id,user_id&user_id=in.({chunk})",
                 headers=database_service.supabase.service_headers,
             )
-
-            if not wallet_data:
-                results.append({"user_id": user_id, "status": "missing_wallet"})
-                continue
-
-            wallet = wallet_data[0]
-
-            # ---------------------------------------------------
-            # ENOUGH BALANCE → DEBIT & LOG TRANSACTION
-            # ---------------------------------------------------
-            if float(wallet["balance"]) >= amount:
-                updated = {
-                    "balance": float(wallet["balance"]) - amount,
-                    "last_transaction_at": datetime.utcnow().isoformat(),
-                }
-
-                # Update wallet
-                database_service.supabase.make_request(
-                    method="PATCH",
-                    endpoint=f"/rest/v1/wallets?id=eq.{wallet['id']}",
-                    data=updated,
-                    headers=database_service.supabase.service_headers,
-                )
-
-                # Log wallet transaction
-                tx = {
-                    "wallet_id": wallet["id"],
-                    "transaction_type": "payment",
-                    "amount": amount,
-                    "currency": "ZAR",
-                    "reference": f"SUB-{package_id}",
-                    "description": "Weekly subscription billing",
-                    "status": "completed",
-                    "metadata": {"source": "cron", "package_id": package_id},
-                }
-
-                database_service.supabase.make_request(
-                    method="POST",
-                    endpoint="/rest/v1/wallet_transactions",
-                    data=tx,
-                    headers=database_service.supabase.service_headers,
-                )
-
-                # Revenue pool update
-                self.add_to_revenue(amount)
-
-                # Log event
-                self.log_event(user_id, package_id, "weekly_deduction", {"amount": amount})
-
-                results.append({"user_id": user_id, "status": "charged"})
-
-            # ---------------------------------------------------
-            # INSUFFICIENT FUNDS
-            # ---------------------------------------------------
-            else:
-                self.log_event(
-                    user_id,
-                    package_id,
-                    "failed_payment",
-                    {"reason": "insufficient_funds"},
-                )
-
-                results.append({"user_id": user_id, "status": "insufficient_funds"})
-
-        return results
+            for wallet in rows or []:
+                wallets.setdefault(wallet["user_id"], wallet)
+        return wallets
 
     # ---------------------------------------------------------
     # Event Logging
     # ---------------------------------------------------------
-    def log_event(self, user_id, package_id, event_type, metadata=None):
-        event = {
+    def _event_row(self, user_id, package_id, event_type, metadata=None, created_at=None):
+        return {
             "id": str(uuid.uuid4()),
             "user_id": user_id,
             "package_id": package_id,
             "event_type": event_type,
             "metadata": metadata,
-            "created_at": datetime.utcnow().isoformat(),
+            "created_at": created_at or datetime.now(timezone.utc).isoformat(),
         }
 
+    def log_event(self, user_id, package_id, event_type, metadata=None):
         database_service.supabase.make_request(
             method="POST",
             endpoint="/rest/v1/subscription_events",
-            data=event,
+            data=self._event_row(user_id, package_id, event_type, metadata),
             headers=database_service.supabase.service_headers,
         )
 
@@ -305,31 +412,26 @@ class SubscriptionService:
     # Revenue Pool
     # ---------------------------------------------------------
     def add_to_revenue(self, amount: float):
-        pool = database_service.supabase.make_request(
-            method="GET",
-            endpoint="/rest/v1/detour_revenue_pool?limit=1",
-            headers=database_service.supabase.service_headers,
-        )
-
-        if not pool:
-            return
-
-        pool = pool[0]
-        new_total = float(pool["total_collected"]) + amount
-
+        # Incremented in the database so concurrent charges cannot overwrite each other
         database_service.supabase.make_request(
-            method="PATCH",
-            endpoint=f"/rest/v1/detour_revenue_pool?id=eq.{pool['id']}",
-            data={
-                "total_collected": new_total,
-                "last_updated": datetime.utcnow().isoformat(),
-            },
+            method="POST",
+            endpoint="/rest/v1/rpc/increment_revenue",
+            data={"amount": amount},
             headers=database_service.supabase.service_headers,
         )
 
     # ---------------------------------------------------------
     # Confirmation Email - UPDATED to use correct email method
     # ---------------------------------------------------------
+    def _send_confirmation_email_logged(self, user_id: str, package_id: str, pkg):
+        """Send the confirmation email; inline and background sends log failures the same way"""
+        try:
+            self.send_confirmation_email(user_id, pkg)
+        except Exception as e:
+            print(f"Warning: Could not send confirmation email: {e}")
+            # Log the email failure but don't fail the subscription activation
+            self.log_event(user_id, package_id, "email_failed", {"error": str(e)})
+
     def send_confirmation_email(self, user_id: str, pkg):
         try:
             # Get user info
@@ -2,7 +2,7 @@
 Subscription Utility Helpers
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import uuid
 
 
@@ -10,7 +10,7 @@ import uuid
 # Generate ISO timestamp (UTC)
 # ---------------------------------------------------------
 def now_iso() -> str:
-    return datetime.utcnow().isoformat()
+    return datetime.now(timezone.utc).isoformat()
 
 
 # ---------------------------------------------------------
@@ -24,21 +24,15 @@ def new_id() -> str:
 # Next Friday Date
 # ---------------------------------------------------------
 def get_next_friday(from_date: datetime = None):
-    if from_date is None:
-        from_date = datetime.utcnow()
+    d = (from_date or datetime.now(timezone.utc)).date()
 
-    # Monday = 0 ... Sunday = 6
-    # Friday = 4
-    days_ahead = 4 - from_date.weekday()
-    if days_ahead <= 0:
-        days_ahead += 7
-
-    return (from_date + timedelta(days=days_ahead)).date()
+    # Monday = 0 ... Friday = 4; a Friday rolls to the following week
+    return d + timedelta(days=(4 - d.weekday()) % 7 or 7)
 
 
 # ---------------------------------------------------------
 # Today's Midnight (UTC)
 # ---------------------------------------------------------
 def today_midnight():
-    now = datetime.utcnow()
+    now = datetime.now(timezone.utc)
     return datetime(now.year, now.month, now.day)
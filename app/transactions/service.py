@@ -1,23 +1,30 @@
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 from app.shared.database import database_service
 from app.wallet.service import wallet_service
-from app.transactions.utils import generate_reference, now_iso
+from app.transactions.utils import generate_reference
+
+_CENT = Decimal("0.01")
+
+
+def _money(value) -> Decimal:
+    # Single representation for amounts: an exact Decimal rounded to cents
+    return abs(Decimal(value)).quantize(_CENT, rounding=ROUND_HALF_UP)
 
 
 class TransactionsService:
 
     # -----------------------------
-    def _get_wallet(self, user_id):
-        wallet = wallet_service.get_wallet_by_user_id(user_id)
+    async def _get_wallet(self, user_id):
+        wallet = await wallet_service.get_wallet_by_user_id(user_id)
         if not wallet:
             return None, {"success": False, "message": "Wallet not found for user"}
         return wallet, None
 
-    def _log(self, wallet_id, tx_type, amount, description, ref=None, metadata=None):
-        return wallet_service.create_transaction(
+    async def _log(self, wallet_id, tx_type, amount, description, ref=None, metadata=None):
+        return await wallet_service.create_transaction(
             wallet_id=wallet_id,
             transaction_type=tx_type,
-            amount=float(amount),
+            amount=amount,
             description=description,
             reference=ref or generate_reference(),
             metadata=metadata or {}
@@ -26,21 +33,22 @@ class TransactionsService:
     # -----------------------------
     # PAYMENT = DEBIT
     # -----------------------------
-    def process_payment(self, req):
-        wallet, error = self._get_wallet(req.user_id)
+    async def process_payment(self, req):
+        wallet, error = await self._get_wallet(req.user_id)
         if error:
             return error
 
-        debit_amount = -abs(float(req.amount))  # negative for debit
+        amount = _money(req.amount)
 
-        result = wallet_service.update_wallet_balance(wallet["id"], debit_amount, "payment")
+        # negative for debit
+        result = await wallet_service.update_wallet_balance(wallet["id"], -amount, "payment")
         if not result["success"]:
             return result
 
-        tx = self._log(
+        tx = await self._log(
             wallet["id"],
             "payment",
-            req.amount,
+            amount,
             req.description or f"{req.payment_type} payment",
             metadata=req.metadata
         )
@@ -55,21 +63,21 @@ class TransactionsService:
     # -----------------------------
     # CREDIT = DEPOSIT
     # -----------------------------
-    def process_credit(self, req):
-        wallet, error = self._get_wallet(req.user_id)
+    async def process_credit(self, req):
+        wallet, error = await self._get_wallet(req.user_id)
         if error:
             return error
 
-        credit_amount = abs(float(req.amount))
+        amount = _money(req.amount)
 
-        result = wallet_service.update_wallet_balance(wallet["id"], credit_amount, "deposit")
+        result = await wallet_service.update_wallet_balance(wallet["id"], amount, "deposit")
         if not result["success"]:
             return result
 
-        tx = self._log(
+        tx = await self._log(
             wallet["id"],
             "deposit",
-            req.amount,
+            amount,
             req.description or f"{req.credit_type} credit",
             metadata=req.metadata
         )
@@ -82,53 +90,48 @@ class TransactionsService:
         }
 
     # -----------------------------
-    # TRANSFER = DEBIT THEN CREDIT
+    # LIMIT-CHECKED CREDIT (single RPC)
     # -----------------------------
-    def process_transfer(self, req):
-        from_wallet, error = self._get_wallet(req.from_user_id)
-        if error:
-            return error
-
-        to_wallet, error = self._get_wallet(req.to_user_id)
-        if error:
-            return error
-
-        amt = float(req.amount)
-
-        # debit sender
-        debit = wallet_service.update_wallet_balance(from_wallet["id"], -amt, "transfer")
-        if not debit["success"]:
-            return debit
-
-        # credit receiver
-        credit = wallet_service.update_wallet_balance(to_wallet["id"], amt, "transfer")
-        if not credit["success"]:
-            return credit
-
-        # log sender
-        self._log(
-            from_wallet["id"],
-            "transfer",
-            amt,
-            "Wallet transfer - debit",
-            metadata={"to_user_id": req.to_user_id}
+    async def credit_wallet(self, req):
+        """Validate subscription limits and credit the wallet in one database call"""
+        supabase = database_service.supabase
+        result = await supabase.amake_request(
+            "POST",
+            "/rest/v1/rpc/credit_wallet",
+            {
+                "p_user_id": req.user_id,
+                "p_amount": req.amount,
+                "p_credit_type": req.credit_type,
+                "p_description": req.description,
+                "p_metadata": req.metadata or {},
+                "p_reference": generate_reference(),
+            },
+            supabase.service_headers,
         )
+        wallet_service.invalidate_user(req.user_id)
+        return result
 
-        # log receiver
-        self._log(
-            to_wallet["id"],
-            "transfer",
-            amt,
-            "Wallet transfer - credit",
-            metadata={"from_user_id": req.from_user_id}
+    # -----------------------------
+    # TRANSFER = DEBIT AND CREDIT (single RPC)
+    # -----------------------------
+    async def process_transfer(self, req):
+        # Both balance updates and both ledger rows commit together server-side
+        supabase = database_service.supabase
+        result = await supabase.amake_request(
+            "POST",
+            "/rest/v1/rpc/transfer_funds",
+            {
+                "p_from_user_id": req.from_user_id,
+                "p_to_user_id": req.to_user_id,
+                "p_amount": req.amount,
+                "p_description": req.description,
+                "p_reference": generate_reference(),
+            },
+            supabase.service_headers,
         )
-
-        return {
-            "success": True,
-            "message": "Transfer completed",
-            "sender_new_balance": debit["new_balance"],
-            "receiver_new_balance": credit["new_balance"]
-        }
+        wallet_service.invalidate_user(req.from_user_id)
+        wallet_service.invalidate_user(req.to_user_id)
+        return result
 
 
 transactions_service = TransactionsService()
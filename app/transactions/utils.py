@@ -1,8 +1,8 @@
-import uuid
-from datetime import datetime
+import secrets
+from datetime import datetime, timezone
 
 def generate_reference(prefix="TX"):
-    return f"{prefix}-{str(uuid.uuid4())[:8].upper()}"
+    return f"{prefix}-{secrets.token_hex(4).upper()}"
 
 def now_iso():
-    return datetime.utcnow().isoformat()
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
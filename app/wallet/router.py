@@ -2,10 +2,14 @@
 Wallet Router
 """
 
+import asyncio
 import logging
+import math
+import httpx
+import orjson
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query
-from decimal import Decimal
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 
 from app.wallet.service import wallet_service
 from app.wallet.schemas import (
@@ -14,25 +18,34 @@ from app.wallet.schemas import (
 )
 from app.shared.database import database_service
 from app.kyc.admin_auth import verify_admin_token
+from app.shared.audit_log import AuditLog
 
 router = APIRouter(tags=["wallet"])
 logger = logging.getLogger(__name__)
 
+_admin_wallet_log = AuditLog("logs/admin_wallet_actions.log")
+
+# Rows fetched per Supabase call while streaming the wallet export
+_EXPORT_PAGE_SIZE = 1000
+
 
 # ---------------------------------------------------------
 # User Wallet Endpoints
 # ---------------------------------------------------------
-@router.get("/user/{user_id}", response_model=SuccessResponse)
+# The read endpoints below return plain dicts in the SuccessResponse shape with
+# response_model=None, so FastAPI hands them straight to ORJSONResponse instead
+# of validating and re-serialising every wallet and transaction row
+@router.get("/user/{user_id}", response_model=None)
 async def get_user_wallet(user_id: str):
-    wallet = wallet_service.get_wallet_by_user_id(user_id)
+    wallet = await wallet_service.get_wallet_by_user_id(user_id)
     if not wallet:
-        return SuccessResponse(success=False, message="Wallet not found", data={"has_wallet": False})
+        return {"success": False, "message": "Wallet not found", "data": {"has_wallet": False}}
 
-    return SuccessResponse(
-        success=True,
-        message="Wallet retrieved",
-        data={"has_wallet": True, "wallet": wallet}
-    )
+    return {
+        "success": True,
+        "message": "Wallet retrieved",
+        "data": {"has_wallet": True, "wallet": wallet},
+    }
 
 
 @router.post("/create", response_model=SuccessResponse)
@@ -41,7 +54,7 @@ async def create_wallet(request: WalletCreateRequest):
     if not user:
         return SuccessResponse(success=False, message="User not found")
 
-    result = wallet_service.create_wallet(request.user_id)
+    result = await wallet_service.create_wallet(request.user_id)
     if result["success"]:
         return SuccessResponse(success=True, message=result["message"], data={"wallet": result.get("wallet")})
 
@@ -50,7 +63,7 @@ async def create_wallet(request: WalletCreateRequest):
 
 @router.post("/{wallet_id}/deposit", response_model=SuccessResponse)
 async def deposit_to_wallet(wallet_id: str, request: DepositRequest):
-    result = wallet_service.deposit_funds(wallet_id, float(request.amount), request.description)
+    result = await wallet_service.deposit_funds(wallet_id, request.amount, request.description)
 
     if result["success"]:
         return SuccessResponse(
@@ -64,7 +77,7 @@ async def deposit_to_wallet(wallet_id: str, request: DepositRequest):
 
 @router.post("/{wallet_id}/withdraw", response_model=SuccessResponse)
 async def withdraw_from_wallet(wallet_id: str, request: WithdrawalRequest):
-    result = wallet_service.withdraw_funds(wallet_id, float(request.amount), request.description)
+    result = await wallet_service.withdraw_funds(wallet_id, request.amount, request.description)
 
     if result["success"]:
         return SuccessResponse(
@@ -76,83 +89,103 @@ async def withdraw_from_wallet(wallet_id: str, request: WithdrawalRequest):
     return SuccessResponse(success=False, message=result["message"])
 
 
-@router.get("/{wallet_id}/transactions", response_model=SuccessResponse)
+@router.get("/{wallet_id}/transactions", response_model=None)
 async def get_wallet_transactions(
     wallet_id: str,
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
 ):
-    transactions = wallet_service.get_transactions(wallet_id, limit, offset)
-    wallet = wallet_service.get_wallet_by_id(wallet_id)
+    (transactions, total), wallet = await asyncio.gather(
+        wallet_service.get_transactions_with_count(wallet_id, limit, offset),
+        wallet_service.get_wallet_by_id(wallet_id),
+    )
 
     if not wallet:
-        return SuccessResponse(success=False, message="Wallet not found")
+        return {"success": False, "message": "Wallet not found", "data": None}
 
-    return SuccessResponse(
-        success=True,
-        message="Transactions retrieved",
-        data={
+    return {
+        "success": True,
+        "message": "Transactions retrieved",
+        "data": {
             "wallet_id": wallet_id,
             "current_balance": wallet["balance"],
-            "total_transactions": len(transactions),
+            "total_transactions": total,
+            "page_size": len(transactions),
             "transactions": transactions,
         },
-    )
+    }
 
 
-@router.get("/{wallet_id}/balance", response_model=SuccessResponse)
+@router.get("/{wallet_id}/balance", response_model=None)
 async def get_wallet_balance(wallet_id: str):
-    wallet = wallet_service.get_wallet_by_id(wallet_id)
+    wallet = await wallet_service.get_wallet_by_id(wallet_id)
     if not wallet:
-        return SuccessResponse(success=False, message="Wallet not found")
+        return {"success": False, "message": "Wallet not found", "data": None}
 
-    return SuccessResponse(
-        success=True,
-        message="Balance retrieved",
-        data={
+    return {
+        "success": True,
+        "message": "Balance retrieved",
+        "data": {
             "wallet_id": wallet_id,
             "wallet_number": wallet["wallet_number"],
             "balance": wallet["balance"],
             "currency": wallet["currency"],
             "last_updated": wallet["updated_at"],
         },
-    )
+    }
 
 
 # ---------------------------------------------------------
 # Admin Wallet Endpoints
 # ---------------------------------------------------------
 @router.get("/admin/all", response_model=SuccessResponse)
-async def get_all_wallets(admin_id: str = Depends(verify_admin_token)):
+async def get_all_wallets(
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    admin_id: str = Depends(verify_admin_token),
+):
     try:
-        endpoint = "/rest/v1/wallets?order=created_at.desc"
-        response = database_service.supabase.make_request(
-            "GET", endpoint, headers=database_service.supabase.service_headers
-        )
-
-        total_balance = sum(float(w.get("balance", 0)) for w in response)
+        try:
+            # Totals and the requested page come back from one aggregate call
+            summary = await database_service.supabase.amake_request(
+                "POST",
+                "/rest/v1/rpc/admin_wallet_summary",
+                {"p_limit": limit, "p_offset": offset},
+                database_service.supabase.service_headers,
+            )
+        except httpx.HTTPStatusError:
+            # RPC not deployed on this database yet
+            summary = await _summarise_wallets_locally(limit, offset)
 
         return SuccessResponse(
             success=True,
             message="All wallets retrieved",
             data={
-                "total_wallets": len(response),
-                "total_balance": total_balance,
-                "wallets": response,
+                "total_wallets": summary["total_wallets"],
+                "total_balance": float(summary["total_balance"]),
+                "limit": limit,
+                "offset": offset,
+                "wallets": summary["wallets"],
             },
         )
     except Exception as e:
         return SuccessResponse(success=False, message=str(e))
 
 
+@router.get("/admin/export")
+async def export_wallets(admin_id: str = Depends(verify_admin_token)):
+    """Every wallet as NDJSON, fetched and sent one page at a time"""
+    return StreamingResponse(_stream_wallets(), media_type="application/x-ndjson")
+
+
 @router.get("/admin/user/{user_id}", response_model=SuccessResponse)
 async def admin_get_user_wallet(user_id: str, admin_id: str = Depends(verify_admin_token)):
-    wallet = wallet_service.get_wallet_by_user_id(user_id)
+    wallet = await wallet_service.get_wallet_by_user_id(user_id)
     if not wallet:
         return SuccessResponse(success=False, message="Wallet not found for user")
 
     user = database_service.get_user_by_id(user_id)
-    transactions = wallet_service.get_transactions(wallet["id"], limit=10)
+    transactions = await wallet_service.get_transactions(wallet["id"], limit=10)
 
     return SuccessResponse(
         success=True,
@@ -169,14 +202,14 @@ async def admin_adjust_balance(
     admin_id: str = Depends(verify_admin_token),
 ):
     try:
-        wallet = wallet_service.get_wallet_by_id(wallet_id)
+        wallet = await wallet_service.get_wallet_by_id(wallet_id)
         if not wallet:
             return SuccessResponse(success=False, message="Wallet not found")
 
         if amount >= 0:
-            result = wallet_service.deposit_funds(wallet_id, amount, f"Admin deposit: {description}")
+            result = await wallet_service.deposit_funds(wallet_id, amount, f"Admin deposit: {description}")
         else:
-            result = wallet_service.withdraw_funds(wallet_id, abs(amount), f"Admin withdrawal: {description}")
+            result = await wallet_service.withdraw_funds(wallet_id, abs(amount), f"Admin withdrawal: {description}")
 
         if result["success"]:
             _log_admin_wallet_action(
@@ -184,7 +217,7 @@ async def admin_adjust_balance(
                 wallet_id=wallet_id,
                 amount=amount,
                 description=description,
-                new_balance=result["new_balance"],
+                new_balance=float(result["new_balance"]),
             )
             return SuccessResponse(success=True, message="Balance adjusted", data=result)
 
@@ -204,11 +237,12 @@ async def update_wallet_status(
         updates = {"status": status.value, "updated_at": datetime.utcnow().isoformat()}
 
         endpoint = f"/rest/v1/wallets?id=eq.{wallet_id}"
-        response = database_service.supabase.make_request(
+        response = await database_service.supabase.amake_request(
             "PATCH", endpoint, updates, database_service.supabase.service_headers
         )
 
         if response:
+            wallet_service.invalidate_wallet(wallet_id)
             return SuccessResponse(success=True, message=f"Wallet status updated to {status.value}")
 
         return SuccessResponse(success=False, message="Failed to update status")
@@ -220,9 +254,47 @@ async def update_wallet_status(
 # ---------------------------------------------------------
 # Internal Helpers
 # ---------------------------------------------------------
+async def _summarise_wallets_locally(limit: int, offset: int):
+    supabase = database_service.supabase
+    # Only the requested page is fetched as full rows; the total needs balances alone
+    (wallets, total), balances = await asyncio.gather(
+        supabase.aget_with_count(
+            "/rest/v1/wallets",
+            {"order": "created_at.desc", "limit": str(limit), "offset": str(offset)},
+            service=True,
+        ),
+        supabase.amake_request("GET", "/rest/v1/wallets", {"select": "balance"}, service=True),
+    )
+    return {
+        "total_wallets": total,
+        # fsum runs the reduction in C and keeps the total exactly rounded
+        "total_balance": math.fsum(float(w.get("balance") or 0) for w in balances),
+        "wallets": wallets,
+    }
+
+
+async def _stream_wallets():
+    # Keyset paging on id: each page is an index range scan, unlike a growing offset
+    params = {"order": "id.asc", "limit": str(_EXPORT_PAGE_SIZE)}
+    try:
+        while True:
+            page = await database_service.supabase.amake_request(
+                "GET", "/rest/v1/wallets", params, service=True
+            )
+            if not page:
+                break
+            yield b"".join(orjson.dumps(w) + b"\n" for w in page)
+            if len(page) < _EXPORT_PAGE_SIZE:
+                break
+            params["id"] = f"gt.{page[-1]['id']}"
+    except Exception as e:
+        # Headers are already sent; end the stream early and leave a trace
+        logger.error(f"Wallet export failed: {e}")
+
+
 def _log_admin_wallet_action(admin_id: str, wallet_id: str, amount: float, description: str, new_balance: float):
     entry = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": datetime.utcnow(),
         "admin_id": admin_id,
         "wallet_id": wallet_id,
         "amount": amount,
@@ -230,9 +302,4 @@ def _log_admin_wallet_action(admin_id: str, wallet_id: str, amount: float, descr
         "new_balance": new_balance,
         "action": "balance_adjustment",
     }
-    try:
-        with open("logs/admin_wallet_actions.log", "a") as f:
-            import json
-            f.write(json.dumps(entry) + "\n")
-    except Exception as e:
-        logger.error(f"Failed to log admin wallet action: {e}")
+    _admin_wallet_log.write(entry)
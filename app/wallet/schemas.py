@@ -2,8 +2,8 @@
 Wallet Schemas
 """
 
-from pydantic import BaseModel, Field, validator
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, Optional, List
 from enum import Enum
 from datetime import datetime
 from decimal import Decimal
@@ -49,17 +49,17 @@ class WalletResponse(BaseModel):
     last_transaction_at: Optional[datetime]
 
 
+# Positive rand amount with at most two decimal places, checked by pydantic-core
+Amount = Annotated[Decimal, Field(gt=0, max_digits=18, decimal_places=2)]
+
+
 class TransactionRequest(BaseModel):
-    amount: Decimal = Field(..., gt=0)
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+
+    amount: Amount
     description: Optional[str] = None
     reference: Optional[str] = None
 
-    @validator("amount")
-    def validate_amount(cls, v):
-        if v <= 0:
-            raise ValueError("Amount must be positive")
-        return v
-
 
 class DepositRequest(TransactionRequest):
     pass
@@ -4,64 +4,58 @@ Wallet Service - Updated for Correct Credit/Debit Handling
 
 import logging
 import uuid
-import random
-import string
+import time
 from datetime import datetime
+from decimal import Decimal
 from typing import Optional, Dict, Any
 
 from app.shared.database import database_service
+from app.transactions.utils import generate_reference
 
 logger = logging.getLogger(__name__)
 
+# Read-through cache for wallet lookups (by id, user or wallet number) on the
+# hot path; balance and status writes made by this process evict the entry
+_WALLET_TTL_SECONDS = 15
+_WALLET_CACHE_SIZE = 10_000
+
+# Fixed values for every wallet_transactions row written from Python
+_CURRENCY = "ZAR"
+_TX_STATUS = "completed"
+_TX_REF_PREFIX = "TX"
+
 
 class WalletService:
     def __init__(self):
         self.supabase = database_service.supabase
+        # wallet_id -> (fetched_at, wallet)
+        self._wallet_cache = {}
+        # (column, value) -> wallet_id, for user_id / wallet_number lookups
+        self._wallet_index = {}
+
+    async def _areq(self, method: str, endpoint: str, data=None, *, service: bool = False):
+        # Every wallet call goes through the shared async Supabase client
+        return await self.supabase.amake_request(method, endpoint, data, service=service)
 
     # ---------------------------------------------------------
     # Wallet Creation
     # ---------------------------------------------------------
-    def generate_wallet_number(self) -> str:
-        while True:
-            code = "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
-            wallet_number = f"WLT-{code}"
-            if not self.get_wallet_by_number(wallet_number):
-                return wallet_number
-
-    def create_wallet(self, user_id: str) -> Dict[str, Any]:
+    async def create_wallet(self, user_id: str) -> Dict[str, Any]:
         try:
-            existing = self.get_wallet_by_user_id(user_id)
-            if existing:
-                return {"success": False, "message": "User already has a wallet", "wallet": existing}
-
-            wallet_number = self.generate_wallet_number()
-
-            data = {
-                "id": str(uuid.uuid4()),
-                "user_id": user_id,
-                "wallet_number": wallet_number,
-                "balance": 0.00,
-                "currency": "ZAR",
-                "status": "active",
-                "created_at": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat(),
-            }
-
-            res = self.supabase.make_request("POST", "/rest/v1/wallets", data, self.supabase.service_headers)
-            if not res:
-                return {"success": False, "message": "Failed to create wallet"}
-
-            wallet_id = res[0]["id"]
-
-            # Log account opening
-            self.create_transaction(
-                wallet_id=wallet_id,
-                transaction_type="account_opening",
-                amount=0.00,
-                description="Wallet account opened",
+            # Existence check, wallet number, wallet row and the account-opening
+            # transaction all happen in one database call
+            result = await self._areq(
+                "POST",
+                "/rest/v1/rpc/create_wallet_with_opening_tx",
+                {"p_user_id": user_id},
+                service=True,
             )
+            if not result:
+                return {"success": False, "message": "Failed to create wallet"}
 
-            return {"success": True, "message": "Wallet created", "wallet": res[0]}
+            if result.get("wallet"):
+                self._remember(result["wallet"], time.monotonic())
+            return result
 
         except Exception as e:
             logger.error(f"Wallet creation error: {e}")
@@ -70,84 +64,176 @@ class WalletService:
     # ---------------------------------------------------------
     # Lookup
     # ---------------------------------------------------------
-    def get_wallet_by_user_id(self, user_id: str):
+    async def get_wallet_by_user_id(self, user_id: str, use_cache: bool = True):
+        return await self._lookup("user_id", user_id, use_cache)
+
+    async def get_wallet_by_id(self, wallet_id: str, use_cache: bool = True):
+        return await self._lookup("id", wallet_id, use_cache)
+
+    async def get_wallet_by_number(self, wallet_number: str, use_cache: bool = True):
+        return await self._lookup("wallet_number", wallet_number, use_cache)
+
+    async def _lookup(self, column: str, value: str, use_cache: bool):
+        now = time.monotonic()
+        if use_cache:
+            wallet_id = value if column == "id" else self._wallet_index.get((column, value))
+            cached = self._wallet_cache.get(wallet_id)
+            if cached and now - cached[0] < _WALLET_TTL_SECONDS:
+                return cached[1]
+
         try:
-            res = self.supabase.make_request(
-                "GET",
-                f"/rest/v1/wallets?user_id=eq.{user_id}",
-                headers=self.supabase.anon_headers,
-            )
-            return res[0] if res else None
+            res = await self._areq("GET", "/rest/v1/wallets", {column: f"eq.{value}", "limit": "1"})
         except:
             return None
 
-    def get_wallet_by_id(self, wallet_id: str):
+        # Misses are not cached so a newly created wallet is visible immediately
+        if not res:
+            return None
+
+        self._remember(res[0], now)
+        return res[0]
+
+    def _remember(self, wallet: Dict[str, Any], now: float):
+        if len(self._wallet_cache) >= _WALLET_CACHE_SIZE:
+            self._wallet_cache.pop(next(iter(self._wallet_cache)))
+        while len(self._wallet_index) >= 2 * _WALLET_CACHE_SIZE:
+            self._wallet_index.pop(next(iter(self._wallet_index)))
+
+        self._wallet_cache[wallet["id"]] = (now, wallet)
+        self._wallet_index[("user_id", wallet["user_id"])] = wallet["id"]
+        self._wallet_index[("wallet_number", wallet["wallet_number"])] = wallet["id"]
+
+    def invalidate_wallet(self, wallet_id: str):
+        self._wallet_cache.pop(wallet_id, None)
+
+    def invalidate_user(self, user_id: str):
+        wallet_id = self._wallet_index.get(("user_id", user_id))
+        if wallet_id is not None:
+            self.invalidate_wallet(wallet_id)
+
+    # ---------------------------------------------------------
+    # Transaction History
+    # ---------------------------------------------------------
+    async def get_transactions(self, wallet_id: str, limit: int = 50, offset: int = 0):
         try:
-            res = self.supabase.make_request(
+            return await self._areq(
                 "GET",
-                f"/rest/v1/wallets?id=eq.{wallet_id}",
-                headers=self.supabase.anon_headers,
+                "/rest/v1/wallet_transactions",
+                self._history_params(wallet_id, limit, offset),
             )
-            return res[0] if res else None
-        except:
-            return None
+        except Exception as e:
+            logger.error(f"Transaction history error: {e}")
+            return []
 
-    def get_wallet_by_number(self, wallet_number: str):
+    async def get_transactions_with_count(self, wallet_id: str, limit: int = 50, offset: int = 0):
+        """One page of history plus the wallet's total transaction count"""
         try:
-            res = self.supabase.make_request(
-                "GET",
-                f"/rest/v1/wallets?wallet_number=eq.{wallet_number}",
-                headers=self.supabase.anon_headers,
+            return await self.supabase.aget_with_count(
+                "/rest/v1/wallet_transactions",
+                self._history_params(wallet_id, limit, offset),
             )
-            return res[0] if res else None
-        except:
-            return None
+        except Exception as e:
+            logger.error(f"Transaction history error: {e}")
+            return [], 0
+
+    @staticmethod
+    def _history_params(wallet_id: str, limit: int, offset: int):
+        return {
+            "wallet_id": f"eq.{wallet_id}",
+            "order": "created_at.desc",
+            "limit": str(limit),
+            "offset": str(offset),
+        }
 
     # ---------------------------------------------------------
     # Balance Update (Unified Deposit / Withdrawal)
     # ---------------------------------------------------------
-    def update_wallet_balance(self, wallet_id: str, amount: float, transaction_type: str):
+    async def update_wallet_balance(self, wallet_id: str, amount: Decimal, transaction_type: str):
         """
         amount > 0  => credit
         amount < 0  => debit
         """
 
-        wallet = self.get_wallet_by_id(wallet_id)
-        if not wallet:
-            return {"success": False, "message": "Wallet not found"}
-
-        new_balance = float(wallet["balance"]) + amount
+        # Atomic in Postgres: the balance check and update happen in one statement
+        res = await self._areq(
+            "POST",
+            "/rest/v1/rpc/wallet_apply_delta",
+            {"p_wallet_id": wallet_id, "p_delta": amount},
+            service=True,
+        )
 
-        # Prevent negative balances unless it's a credit/refund
-        if new_balance < 0:
+        if not res:
+            self.invalidate_wallet(wallet_id)
+            if not await self.get_wallet_by_id(wallet_id):
+                return {"success": False, "message": "Wallet not found"}
+            # Prevent negative balances
             return {"success": False, "message": "Insufficient funds"}
 
-        updates = {
-            "balance": new_balance,
-            "updated_at": datetime.utcnow().isoformat(),
-            "last_transaction_at": datetime.utcnow().isoformat(),
-        }
+        wallet = res[0]
+        self._remember(wallet, time.monotonic())
+        return {"success": True, "new_balance": Decimal(str(wallet["balance"])), "wallet": wallet}
 
-        res = self.supabase.make_request(
-            "PATCH",
-            f"/rest/v1/wallets?id=eq.{wallet_id}",
-            updates,
-            self.supabase.service_headers,
-        )
+    # ---------------------------------------------------------
+    # Deposit / Withdrawal
+    # ---------------------------------------------------------
+    async def deposit_funds(self, wallet_id: str, amount: Decimal, description: str = ""):
+        return await self.apply_funds(wallet_id, amount, "deposit", description)
 
-        if not res:
-            return {"success": False, "message": "Failed to update balance"}
+    async def withdraw_funds(self, wallet_id: str, amount: Decimal, description: str = ""):
+        return await self.apply_funds(wallet_id, -amount, "withdrawal", description)
 
-        return {"success": True, "new_balance": new_balance, "wallet": res[0]}
+    async def apply_funds(
+        self,
+        wallet_id: str,
+        delta: Decimal,
+        transaction_type: str,
+        description: str = "",
+        reference: str = "",
+        metadata: Dict = None,
+    ):
+        """
+        Apply a signed amount and record its wallet_transactions row in one
+        database transaction; debits past a zero balance are rejected.
+        """
+        try:
+            result = await self._areq(
+                "POST",
+                "/rest/v1/rpc/wallet_apply",
+                {
+                    "p_wallet_id": wallet_id,
+                    "p_delta": delta,
+                    "p_type": transaction_type,
+                    "p_reference": reference or generate_reference(_TX_REF_PREFIX),
+                    "p_description": description,
+                    "p_metadata": metadata or {},
+                },
+                service=True,
+            )
+        except Exception as e:
+            logger.error(f"{transaction_type.capitalize()} error: {e}")
+            return {"success": False, "message": str(e)}
+
+        if not result.get("success"):
+            self.invalidate_wallet(wallet_id)
+            return result
+
+        self._remember(result["wallet"], time.monotonic())
+        return {
+            "success": True,
+            "message": f"{transaction_type.capitalize()} successful",
+            "new_balance": Decimal(str(result["new_balance"])),
+            "wallet": result["wallet"],
+            "transaction": result["transaction"],
+        }
 
     # ---------------------------------------------------------
     # Transaction Logging
     # ---------------------------------------------------------
-    def create_transaction(
+    async def create_transaction(
         self,
         wallet_id: str,
         transaction_type: str,
-        amount: float,
+        amount: Decimal,
         description: str = "",
         reference: str = "",
         metadata: Dict = None,
@@ -158,19 +244,19 @@ class WalletService:
                 "wallet_id": wallet_id,
                 "transaction_type": transaction_type,
                 "amount": amount,
-                "currency": "ZAR",
-                "reference": reference or f"TX-{str(uuid.uuid4())[:8].upper()}",
+                "currency": _CURRENCY,
+                "reference": reference or generate_reference(_TX_REF_PREFIX),
                 "description": description,
-                "status": "completed",
+                "status": _TX_STATUS,
                 "metadata": metadata or {},
                 "created_at": datetime.utcnow().isoformat(),
             }
 
-            res = self.supabase.make_request(
+            res = await self._areq(
                 "POST",
                 "/rest/v1/wallet_transactions",
                 tx,
-                self.supabase.service_headers,
+                service=True,
             )
 
             if not res:
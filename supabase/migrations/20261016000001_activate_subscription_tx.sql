@@ -0,0 +1,43 @@
+-- Activate a subscription in one round trip.
+-- Inserts the user_subscriptions row and its "activated" event atomically,
+-- and refuses a second active subscription even under concurrent requests.
+create or replace function public.activate_subscription_tx(p_user uuid, p_pkg uuid)
+returns setof public.user_subscriptions
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_price numeric;
+    v_sub public.user_subscriptions;
+begin
+    -- Serialise activations for the same user
+    perform pg_advisory_xact_lock(hashtext(p_user::text));
+
+    if exists (
+        select 1 from user_subscriptions where user_id = p_user and is_active
+    ) then
+        raise exception 'User already has an active subscription';
+    end if;
+
+    select price into v_price from subscription_packages where id = p_pkg;
+    if not found then
+        raise exception 'Subscription package not found';
+    end if;
+
+    insert into user_subscriptions (
+        id, user_id, package_id, is_active, start_date,
+        renewal_period, current_weekly_price, created_at, updated_at
+    )
+    values (
+        gen_random_uuid(), p_user, p_pkg, true, (now() at time zone 'utc')::date,
+        'weekly', v_price, now(), now()
+    )
+    returning * into v_sub;
+
+    insert into subscription_events (id, user_id, package_id, event_type, metadata, created_at)
+    values (gen_random_uuid(), p_user, p_pkg, 'activated', null, now());
+
+    return next v_sub;
+end;
+$$;
@@ -0,0 +1,14 @@
+-- Add to the revenue pool in a single statement.
+-- Replaces the GET + PATCH read-modify-write, which lost updates when
+-- charges landed concurrently.
+create or replace function public.increment_revenue(amount numeric)
+returns void
+language sql
+security definer
+set search_path = public
+as $$
+    update detour_revenue_pool
+    set total_collected = total_collected + amount,
+        last_updated = now()
+    where id = (select id from detour_revenue_pool limit 1);
+$$;
@@ -0,0 +1,76 @@
+-- Atomic wallet-to-wallet transfer.
+-- Debits the sender, credits the receiver and writes both ledger rows in a
+-- single transaction, so a failure part way through cannot lose money.
+create or replace function public.transfer_funds(
+    p_from_user_id uuid,
+    p_to_user_id uuid,
+    p_amount numeric,
+    p_description text default null
+)
+returns jsonb
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_from public.wallets;
+    v_to public.wallets;
+    v_txs jsonb;
+begin
+    if p_amount is null or p_amount <= 0 then
+        return jsonb_build_object('success', false, 'message', 'Amount must be greater than zero');
+    end if;
+
+    -- Lock both wallets in id order so opposing transfers cannot deadlock
+    perform 1 from wallets
+    where user_id in (p_from_user_id, p_to_user_id)
+    order by id
+    for update;
+
+    select * into v_from from wallets where user_id = p_from_user_id;
+    select * into v_to from wallets where user_id = p_to_user_id;
+    if v_from.id is null or v_to.id is null then
+        return jsonb_build_object('success', false, 'message', 'Wallet not found for user');
+    end if;
+
+    if v_from.balance < p_amount then
+        return jsonb_build_object('success', false, 'message', 'Insufficient funds');
+    end if;
+
+    update wallets
+    set balance = balance - p_amount, updated_at = now(), last_transaction_at = now()
+    where id = v_from.id
+    returning * into v_from;
+
+    update wallets
+    set balance = balance + p_amount, updated_at = now(), last_transaction_at = now()
+    where id = v_to.id
+    returning * into v_to;
+
+    with inserted as (
+        insert into wallet_transactions (
+            id, wallet_id, transaction_type, amount, currency, reference,
+            description, status, metadata, created_at
+        )
+        values
+            (gen_random_uuid(), v_from.id, 'transfer', p_amount, 'ZAR',
+             'TX-' || upper(substr(md5(random()::text), 1, 8)),
+             coalesce(p_description, 'Wallet transfer - debit'), 'completed',
+             jsonb_build_object('to_user_id', p_to_user_id), now()),
+            (gen_random_uuid(), v_to.id, 'transfer', p_amount, 'ZAR',
+             'TX-' || upper(substr(md5(random()::text), 1, 8)),
+             coalesce(p_description, 'Wallet transfer - credit'), 'completed',
+             jsonb_build_object('from_user_id', p_from_user_id), now())
+        returning *
+    )
+    select jsonb_agg(to_jsonb(inserted)) into v_txs from inserted;
+
+    return jsonb_build_object(
+        'success', true,
+        'message', 'Transfer completed',
+        'sender_new_balance', v_from.balance,
+        'receiver_new_balance', v_to.balance,
+        'transactions', v_txs
+    );
+end;
+$$;
@@ -0,0 +1,11 @@
+-- Wallet totals for the admin dashboard, aggregated in the database
+-- instead of summing every wallet row in the API.
+create or replace function public.admin_wallet_summary()
+returns table (total_wallets bigint, total_balance numeric)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    select count(*), coalesce(sum(balance), 0) from wallets;
+$$;
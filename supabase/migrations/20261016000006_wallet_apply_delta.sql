@@ -0,0 +1,18 @@
+-- Apply a signed amount to a wallet balance in a single statement.
+-- Replaces the GET + PATCH read-modify-write, which lost updates under
+-- concurrent deposits/withdrawals. Returns no row when the wallet does not
+-- exist or the debit would take the balance below zero.
+create or replace function public.wallet_apply_delta(p_wallet_id uuid, p_delta numeric)
+returns setof public.wallets
+language sql
+security definer
+set search_path = public
+as $$
+    update wallets
+    set balance = balance + p_delta,
+        updated_at = now(),
+        last_transaction_at = now()
+    where id = p_wallet_id
+      and balance + p_delta >= 0
+    returning *;
+$$;
@@ -0,0 +1,55 @@
+-- Create a user's wallet and its account-opening ledger row in one call.
+-- The wallet number is generated here and guaranteed unique by the index
+-- below; a collision simply retries with a fresh number.
+create unique index if not exists wallets_wallet_number_key on public.wallets (wallet_number);
+
+create or replace function public.create_wallet_with_opening_tx(p_user_id uuid)
+returns jsonb
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_wallet public.wallets;
+begin
+    -- Serialise wallet creation for the same user
+    perform pg_advisory_xact_lock(hashtext('wallet:' || p_user_id::text));
+
+    select * into v_wallet from wallets where user_id = p_user_id;
+    if found then
+        return jsonb_build_object('success', false, 'message', 'User already has a wallet',
+            'wallet', to_jsonb(v_wallet));
+    end if;
+
+    for attempt in 1..5 loop
+        begin
+            insert into wallets (
+                id, user_id, wallet_number, balance, currency, status, created_at, updated_at
+            )
+            values (
+                gen_random_uuid(), p_user_id,
+                'WLT-' || upper(substr(replace(gen_random_uuid()::text, '-', ''), 1, 6)),
+                0, 'ZAR', 'active', now(), now()
+            )
+            returning * into v_wallet;
+            exit;
+        exception when unique_violation then
+            if attempt = 5 then
+                raise;
+            end if;
+        end;
+    end loop;
+
+    insert into wallet_transactions (
+        id, wallet_id, transaction_type, amount, currency, reference,
+        description, status, metadata, created_at
+    )
+    values (
+        gen_random_uuid(), v_wallet.id, 'account_opening', 0, 'ZAR',
+        'TX-' || upper(substr(replace(gen_random_uuid()::text, '-', ''), 1, 8)),
+        'Wallet account opened', 'completed', '{}'::jsonb, now()
+    );
+
+    return jsonb_build_object('success', true, 'message', 'Wallet created', 'wallet', to_jsonb(v_wallet));
+end;
+$$;
@@ -0,0 +1,24 @@
+-- Admin wallet listing in one call: totals plus one page of wallets.
+-- Supersedes the zero-argument admin_wallet_summary().
+drop function if exists public.admin_wallet_summary();
+
+create or replace function public.admin_wallet_summary(p_limit int default 50, p_offset int default 0)
+returns jsonb
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    select jsonb_build_object(
+        'total_wallets', (select count(*) from wallets),
+        'total_balance', (select coalesce(sum(balance), 0) from wallets),
+        'wallets', coalesce((
+            select jsonb_agg(to_jsonb(w) order by w.created_at desc)
+            from (
+                select * from wallets
+                order by created_at desc
+                limit p_limit offset p_offset
+            ) w
+        ), '[]'::jsonb)
+    );
+$$;
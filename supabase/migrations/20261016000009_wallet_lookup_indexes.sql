@@ -0,0 +1,18 @@
+-- Indexes for the wallet service's single-column lookups and history pages.
+-- wallets.wallet_number is already covered by the unique index from
+-- 20261016000007. Migrations run inside a transaction, so these are built
+-- without CONCURRENTLY; on a large live table, create them by hand with
+-- CONCURRENTLY first and this file becomes a no-op.
+create index if not exists wallets_user_id_idx
+    on public.wallets (user_id);
+
+-- Admin listing: order=created_at.desc with limit/offset
+create index if not exists wallets_created_at_idx
+    on public.wallets (created_at desc);
+
+-- Transaction history: wallet_id=eq.X&order=created_at.desc&limit=N
+create index if not exists wallet_transactions_wallet_created_idx
+    on public.wallet_transactions (wallet_id, created_at desc);
+
+analyze public.wallets;
+analyze public.wallet_transactions;
@@ -0,0 +1,3 @@
+-- Every wallet is created with a number by create_wallet_with_opening_tx;
+-- make that a constraint so the unique index on wallet_number covers all rows.
+alter table public.wallets alter column wallet_number set not null;
@@ -0,0 +1,18 @@
+-- Credits always apply; only debits are checked against the balance.
+-- Previously a credit smaller than an existing shortfall (e.g. a repayment
+-- into a wallet left negative by legacy data) was rejected as
+-- "insufficient funds".
+create or replace function public.wallet_apply_delta(p_wallet_id uuid, p_delta numeric)
+returns setof public.wallets
+language sql
+security definer
+set search_path = public
+as $$
+    update wallets
+    set balance = balance + p_delta,
+        updated_at = now(),
+        last_transaction_at = now()
+    where id = p_wallet_id
+      and (p_delta >= 0 or balance + p_delta >= 0)
+    returning *;
+$$;
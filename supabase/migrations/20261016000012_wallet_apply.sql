@@ -0,0 +1,54 @@
+-- Apply a signed amount to a wallet and record the matching
+-- wallet_transactions row in the same transaction. Used by deposits and
+-- withdrawals so the balance and its history can never disagree.
+-- Debits are rejected when they would take the balance below zero.
+create or replace function public.wallet_apply(
+    p_wallet_id uuid,
+    p_delta numeric,
+    p_type text,
+    p_reference text,
+    p_description text default '',
+    p_metadata jsonb default '{}'::jsonb
+)
+returns jsonb
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_wallet public.wallets;
+    v_tx public.wallet_transactions;
+begin
+    update wallets
+    set balance = balance + p_delta,
+        updated_at = now(),
+        last_transaction_at = now()
+    where id = p_wallet_id
+      and (p_delta >= 0 or balance + p_delta >= 0)
+    returning * into v_wallet;
+
+    if not found then
+        if exists (select 1 from wallets where id = p_wallet_id) then
+            return jsonb_build_object('success', false, 'message', 'Insufficient funds');
+        end if;
+        return jsonb_build_object('success', false, 'message', 'Wallet not found');
+    end if;
+
+    insert into wallet_transactions (
+        id, wallet_id, transaction_type, amount, currency, reference,
+        description, status, metadata, created_at
+    )
+    values (
+        gen_random_uuid(), p_wallet_id, p_type, abs(p_delta), v_wallet.currency, p_reference,
+        coalesce(p_description, ''), 'completed', coalesce(p_metadata, '{}'::jsonb), now()
+    )
+    returning * into v_tx;
+
+    return jsonb_build_object(
+        'success', true,
+        'new_balance', v_wallet.balance,
+        'wallet', to_jsonb(v_wallet),
+        'transaction', to_jsonb(v_tx)
+    );
+end;
+$$;
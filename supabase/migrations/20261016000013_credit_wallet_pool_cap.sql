@@ -0,0 +1,99 @@
+-- credit_wallet: cap the credit at min(weekly limit, issuer pool balance),
+-- matching AdvancesService._compute_availability, and refuse wallets that
+-- are not active. The issuer pool row is locked for the check.
+create or replace function public.credit_wallet(
+    p_user_id uuid,
+    p_amount numeric,
+    p_credit_type text,
+    p_description text,
+    p_metadata jsonb,
+    p_reference text
+)
+returns jsonb
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_wallet public.wallets;
+    v_weekly_limit numeric;
+    v_pool_balance numeric;
+    v_available numeric;
+    v_outstanding numeric;
+    v_tx public.wallet_transactions;
+begin
+    if p_amount is null or p_amount <= 0 then
+        return jsonb_build_object('success', false, 'status', 400,
+            'message', 'Amount must be greater than zero');
+    end if;
+
+    -- Row lock serialises concurrent credits to the same wallet
+    select * into v_wallet from wallets where user_id = p_user_id for update;
+    if not found then
+        return jsonb_build_object('success', false, 'status', 404,
+            'message', 'Wallet not found');
+    end if;
+
+    if v_wallet.status is distinct from 'active' then
+        return jsonb_build_object('success', false, 'status', 403,
+            'message', format('Wallet is %s', v_wallet.status));
+    end if;
+
+    select p.weekly_advance_limit into v_weekly_limit
+    from user_subscriptions s
+    join subscription_packages p on p.id = s.package_id
+    where s.user_id = p_user_id and s.is_active
+    limit 1;
+    if not found then
+        return jsonb_build_object('success', false, 'status', 403,
+            'message', 'You must have an active subscription');
+    end if;
+
+    select coalesce(sum(outstanding_amount), 0) into v_outstanding
+    from user_advances
+    where user_id = p_user_id and status = 'active';
+    if v_outstanding > 0 then
+        return jsonb_build_object('success', false, 'status', 403,
+            'message', format('You have an unpaid advance of R%s. Please settle before requesting more.', v_outstanding));
+    end if;
+
+    -- Same rule as AdvancesService._compute_availability: the weekly limit,
+    -- capped by what the issuer pool holds. Locked so concurrent credits see
+    -- a consistent pool balance.
+    select current_balance into v_pool_balance
+    from advance_issuer_pool
+    limit 1
+    for update;
+    v_available := least(v_weekly_limit, coalesce(v_pool_balance, 0));
+
+    if p_amount > v_available then
+        return jsonb_build_object('success', false, 'status', 403,
+            'message', format('Your available advance is R%s. You requested R%s.', v_available, p_amount));
+    end if;
+
+    update wallets
+    set balance = balance + p_amount,
+        updated_at = now(),
+        last_transaction_at = now()
+    where id = v_wallet.id
+    returning * into v_wallet;
+
+    insert into wallet_transactions (
+        id, wallet_id, transaction_type, amount, currency, reference,
+        description, status, metadata, created_at
+    )
+    values (
+        gen_random_uuid(), v_wallet.id, 'deposit', p_amount, 'ZAR', p_reference,
+        coalesce(p_description, p_credit_type || ' credit'), 'completed',
+        coalesce(p_metadata, '{}'::jsonb), now()
+    )
+    returning * into v_tx;
+
+    return jsonb_build_object(
+        'success', true,
+        'message', 'Credit successful',
+        'new_balance', v_wallet.balance,
+        'transaction', to_jsonb(v_tx)
+    );
+end;
+$$;